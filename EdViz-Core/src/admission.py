@@ -0,0 +1,207 @@
+"""
+Admission control for expensive endpoints.
+
+Each endpoint class (e.g. "upload" for LLM-backed uploads, "render" for
+Mermaid CLI renders) gets a per-client token bucket, a global concurrency
+cap and a bounded wait queue. Requests over the client's rate get 429,
+requests that find the queue full (or wait too long) get 503, both with a
+Retry-After header, so admitted requests keep predictable latency.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request
+from slowapi.util import get_remote_address
+
+from config import config
+from metrics import registry
+
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "edviz_admission_in_flight",
+    "Requests currently being processed, per endpoint class",
+    ("endpoint_class",),
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "edviz_admission_queue_depth",
+    "Requests waiting for a concurrency slot, per endpoint class",
+    ("endpoint_class",),
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "edviz_admission_rejections_total",
+    "Requests rejected by admission control",
+    ("endpoint_class", "reason"),
+)
+ADMISSION_WAIT = registry.histogram(
+    "edviz_admission_wait_seconds",
+    "Time admitted requests spent waiting for a concurrency slot",
+    ("endpoint_class",),
+)
+
+# Defaults per endpoint class: (requests per minute, burst, concurrency, queue size, queue timeout seconds)
+DEFAULT_LIMITS: Dict[str, Tuple[float, int, int, int, float]] = {
+    "upload": (10, 3, 4, 8, 120.0),
+    "render": (30, 10, 2, 16, 30.0),
+}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity` tokens"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """Take a token. Returns 0 on success, otherwise seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Return a token taken for a request that was not served"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class AdmissionController:
+    """Rate limiting and concurrency control for one endpoint class"""
+
+    def __init__(self, name: str, per_minute: float, burst: int, concurrency: int, queue_size: int,
+                 queue_timeout: float, max_clients: int = 10000):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.in_flight = 0
+        self.waiting = 0
+        # Exponentially weighted average of processing time, used for Retry-After estimates
+        self.avg_service_time = 1.0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    def from_config(cls, name: str) -> "AdmissionController":
+        per_minute, burst, concurrency, queue_size, queue_timeout = DEFAULT_LIMITS.get(name, DEFAULT_LIMITS["render"])
+        prefix = f"ADMISSION_{name.upper()}"
+        return cls(
+            name,
+            per_minute=config.get_float(f"{prefix}_PER_MINUTE", per_minute),
+            burst=config.get_int(f"{prefix}_BURST", burst),
+            concurrency=config.get_int(f"{prefix}_CONCURRENCY", concurrency),
+            queue_size=config.get_int(f"{prefix}_QUEUE_SIZE", queue_size),
+            queue_timeout=config.get_float(f"{prefix}_QUEUE_TIMEOUT", queue_timeout),
+        )
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client] = bucket
+            # Forget the least recently seen clients so memory stays bounded
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def _retry_after_overload(self) -> int:
+        backlog = self.waiting + self.in_flight
+        return max(1, math.ceil(self.avg_service_time * backlog / self.concurrency))
+
+    def _reject(self, status_code: int, reason: str, retry_after: int, detail: str) -> HTTPException:
+        ADMISSION_REJECTIONS.inc(endpoint_class=self.name, reason=reason)
+        return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    async def acquire(self, client: str) -> None:
+        """Admit a request or raise a 429/503 HTTPException"""
+        # Check capacity first so requests shed for overload do not use up the client's rate limit
+        if self.in_flight + self.waiting >= self.concurrency + self.queue_size:
+            raise self._reject(503, "queue_full", self._retry_after_overload(), "Server is busy. Please try again later.")
+
+        bucket = self._bucket(client)
+        wait = bucket.try_acquire()
+        if wait > 0:
+            raise self._reject(429, "rate_limited", math.ceil(wait), "Too many requests. Please slow down.")
+
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.set(self.waiting, endpoint_class=self.name)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            bucket.refund()
+            raise self._reject(503, "queue_timeout", self._retry_after_overload(), "Server is busy. Please try again later.")
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, endpoint_class=self.name)
+
+        ADMISSION_WAIT.observe(time.monotonic() - started, endpoint_class=self.name)
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, endpoint_class=self.name)
+
+    def release(self, service_time: float) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, endpoint_class=self.name)
+        self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(name: str) -> AdmissionController:
+    """Return the shared controller for an endpoint class, creating it on first use"""
+    controller = _controllers.get(name)
+    if controller is None:
+        controller = AdmissionController.from_config(name)
+        _controllers[name] = controller
+    return controller
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+
+@asynccontextmanager
+async def admission_slot(endpoint_class: str, request: Request):
+    """Hold an admission slot for the duration of the block (raises 429/503 if rejected)"""
+    controller = get_admission_controller(endpoint_class)
+    await controller.acquire(get_remote_address(request))
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        controller.release(time.monotonic() - started)
+
+
+def admit(endpoint_class: str):
+    """
+    FastAPI dependency enforcing admission control for an endpoint class.
+
+    Usage: @app.post("/render-graph", dependencies=[Depends(admit("render"))])
+    """
+    async def dependency(request: Request):
+        async with admission_slot(endpoint_class, request):
+            yield
+
+    return dependency
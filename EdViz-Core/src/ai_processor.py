@@ -1,20 +1,68 @@
 import httpx
 import json
 import logging
-from typing import Dict, Any, Optional, Protocol
-import os
-from dotenv import load_dotenv
+from typing import Dict, Any, Optional, Protocol, Tuple
 import re
 from abc import ABC, abstractmethod
 import openai
 from openai import AsyncOpenAI
 
-load_dotenv()
+from config import config
+from metrics import RETRIES, PARSE_FAILURES
 
 logger = logging.getLogger(__name__)
 
+PIPELINE_MODES = ("two_step", "single_call")
+
+SUMMARY_AND_GRAPH_PROMPT = """You are an expert educational content generator that outputs JSON for a concept map.
+Read the input text and return ONE JSON object with exactly three keys: "summary", "nodes" and "links".
+- "summary": a comprehensive, well-structured explanatory text that defines each key concept and explicitly describes the relationships between concepts, organized in a logical (hierarchical, causal or thematic) flow.
+- "nodes": the concepts of the summary. Each node must have: id (string), name (string), group (integer).
+- "links": the relationships between nodes. Each link must have: source (node id), target (node id), type (string), and description (string).
+Use varied and specific relationship types (e.g. is a type of, is part of, leads to, enables, is defined as, contrasts with). Avoid generic labels such as 'relation', 'related to' or 'connection', and do not use the same relationship phrase more than 4 times.
+Return ONLY the JSON object, for example: {"summary": "...", "nodes": [{"id": "photosynthesis", "name": "Photosynthesis", "group": 1}], "links": [{"source": "photosynthesis", "target": "glucose", "type": "produces", "description": "..."}]}"""
+
+# JSON schema for providers with strict structured outputs
+SUMMARY_AND_GRAPH_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "name": {"type": "string"},
+                    "group": {"type": "integer"}
+                },
+                "required": ["id", "name", "group"],
+                "additionalProperties": False
+            }
+        },
+        "links": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string"},
+                    "target": {"type": "string"},
+                    "type": {"type": "string"},
+                    "description": {"type": "string"}
+                },
+                "required": ["source", "target", "type", "description"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["summary", "nodes", "links"],
+    "additionalProperties": False
+}
+
 class AIClient(ABC):
     """Abstract base class for AI API clients"""
+    provider_name = "unknown"
+
     @abstractmethod
     async def generate_comprehensive_text(self, text: str) -> str:
         pass
@@ -23,7 +71,14 @@ class AIClient(ABC):
     async def generate_graph_json(self, text: str) -> Dict[str, Any]:
         pass
 
+    async def generate_summary_and_graph(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        """Summary and graph JSON; providers with structured outputs do this in a single call"""
+        summary = await self.generate_comprehensive_text(text)
+        return summary, await self.generate_graph_json(summary)
+
 class DeepSeekClient(AIClient):
+    provider_name = "deepseek"
+
     def __init__(self, api_key: str, base_url: str):
         self.api_key = api_key
         self.base_url = base_url
@@ -33,7 +88,7 @@ class DeepSeekClient(AIClient):
 
     async def _make_api_request(self, endpoint: str, payload: Dict[str, Any], retry_count: int = 0) -> Dict[str, Any]:
         """Make API request with retry logic"""
-        logger.debug(f"Making DeepSeek request to {self.base_url}/{endpoint}")
+        logger.debug("Making DeepSeek request to %s/%s", self.base_url, endpoint)
 
         try:
             async with httpx.AsyncClient(timeout=self.timeout) as client:
@@ -66,6 +121,7 @@ class DeepSeekClient(AIClient):
         except httpx.TimeoutException:
             if retry_count < self.max_retries:
                 logger.warning(f"Request timed out, retrying... (attempt {retry_count + 1}/{self.max_retries})")
+                RETRIES.inc(provider=self.provider_name, reason="timeout")
                 return await self._make_api_request(endpoint, payload, retry_count + 1)
             raise
         except Exception as e:
@@ -110,11 +166,32 @@ class DeepSeekClient(AIClient):
         response = await self._make_api_request("completions", payload)
         return extract_graph_json_from_text(response["choices"][0]["text"].strip())
 
+    async def generate_summary_and_graph(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        payload = {
+            "model": "deepseek-chat",
+            "messages": [
+                {"role": "system", "content": SUMMARY_AND_GRAPH_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            # JSON output mode guarantees a parseable object (the prompt must mention JSON)
+            "response_format": {"type": "json_object"},
+            "max_tokens": 8000,
+            "temperature": 0.7
+        }
+
+        response = await self._make_api_request("chat/completions", payload)
+        choice = response["choices"][0]
+        return parse_summary_and_graph(choice["message"]["content"], choice.get("finish_reason"))
+
 class OpenAIClient(AIClient):
+    provider_name = "openai"
+
     def __init__(self, api_key: str, model: str):
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
         self.max_text_length = 6000
+        # Cleared when the model rejects json_schema response formats (falls back to JSON mode)
+        self.supports_json_schema = True
 
     async def generate_comprehensive_text(self, text: str) -> str:
         prompt_prefix = "You are an expert educational content generator. Your task is to write a comprehensive, well-structured explanatory text that connects and explains a list of given concepts in a way that is ideal for generating a concept map. The output must: Define and explain each concept clearly. Explicitly describe the relationships between concepts Use varied and specific linking phrases to represent different types of relationships, such as: Hierarchical: is a type of, is part of, belongs to. Causal: leads to, causes, results in, is triggered by. Functional: is used for, enables, facilitates, supports. Associative: is related to, correlates with, interacts with. Definitional: is defined as, refers to, means. Comparative: is similar to, differs from, contrasts with. Ensure each sentence can be easily converted into a concept map structure using node-link-node format. Organize the text in a logical flow, either hierarchical, causal, or thematic depending on the topic. Ensure each sentence can be translated into a node-link-node format for concept map generation."
@@ -158,6 +235,66 @@ class OpenAIClient(AIClient):
             logger.error(f"OpenAI API error: {str(e)}")
             raise
 
+    async def generate_summary_and_graph(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        messages = [
+            {"role": "system", "content": SUMMARY_AND_GRAPH_PROMPT},
+            {"role": "user", "content": text}
+        ]
+        json_schema_format = {
+            "type": "json_schema",
+            "json_schema": {"name": "concept_map", "strict": True, "schema": SUMMARY_AND_GRAPH_SCHEMA}
+        }
+
+        try:
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    response_format=json_schema_format if self.supports_json_schema else {"type": "json_object"},
+                    max_tokens=10000,
+                    temperature=0.7
+                )
+            except openai.BadRequestError as e:
+                # Only an unsupported output format warrants the fallback; other 400s
+                # (context length, content policy, bad model) are real failures
+                if not self.supports_json_schema or not _rejects_json_schema(e):
+                    raise
+                logger.warning("Model %s rejected json_schema output, using JSON mode: %s", self.model, e)
+                self.supports_json_schema = False
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    max_tokens=10000,
+                    temperature=0.7
+                )
+            choice = response.choices[0]
+            return parse_summary_and_graph(choice.message.content, choice.finish_reason)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            raise
+
+def _rejects_json_schema(error: openai.BadRequestError) -> bool:
+    """Whether a 400 from the API is about the requested response_format"""
+    names = (getattr(error, "param", None) or "", getattr(error, "code", None) or "", str(error))
+    return any("response_format" in name or "json_schema" in name for name in names)
+
+def parse_summary_and_graph(content: Optional[str], finish_reason: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Split a structured single-call response into (summary, graph JSON)"""
+    try:
+        if finish_reason == "length":
+            raise ValueError("Structured response was cut off by the token limit")
+        data = json.loads(content or "")
+        if not isinstance(data, dict) or not isinstance(data.get("summary"), str):
+            raise ValueError("Structured response has no summary")
+        if not isinstance(data.get("nodes"), list) or not isinstance(data.get("links"), list):
+            raise ValueError("Structured response has no nodes/links")
+    except (ValueError, TypeError) as e:
+        PARSE_FAILURES.inc(kind="structured_output")
+        logger.error("Invalid structured response: %s", e)
+        raise ValueError(f"Invalid structured response: {e}")
+    return data["summary"].strip(), {"nodes": data["nodes"], "links": data["links"]}
+
 def extract_graph_json_from_text(response_text: str) -> Dict[str, Any]:
     """Extract the graph JSON (nodes and links) from a text response."""
     logger.debug("Will extract graph from json")
@@ -186,6 +323,7 @@ def extract_graph_json_from_text(response_text: str) -> Dict[str, Any]:
                         start = None
         
         if not json_objects:
+            PARSE_FAILURES.inc(kind="graph_json")
             raise ValueError("No valid graph JSON found in response")
         
         # Return the first valid graph JSON found
@@ -198,14 +336,14 @@ def extract_graph_json_from_text(response_text: str) -> Dict[str, Any]:
 class AIProcessor:
     def __init__(self):
         # Get enabled status for each AI client
-        self.use_openai = os.getenv("ENABLE_OPENAI", "false").lower() == "true"
-        self.use_deepseek = os.getenv("ENABLE_DEEPSEEK", "true").lower() == "true"
+        self.use_openai = config.get_bool("ENABLE_OPENAI", False)
+        self.use_deepseek = config.get_bool("ENABLE_DEEPSEEK", True)
         self.client: Optional[AIClient] = None
         
         # Try OpenAI first if enabled
         if self.use_openai:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            openai_model = os.getenv("OPENAI_MODEL", "gpt-4")
+            openai_api_key = config.get_env_var("OPENAI_API_KEY")
+            openai_model = config.get_env_var("OPENAI_MODEL", "gpt-4")
             
             if openai_api_key:
                 self.client = OpenAIClient(openai_api_key, openai_model)
@@ -216,8 +354,8 @@ class AIProcessor:
         
         # Fall back to DeepSeek if OpenAI is not enabled or failed
         if not self.use_openai and self.use_deepseek:
-            deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-            deepseek_base_url = os.getenv("DEEPSEEK_API_URL")
+            deepseek_api_key = config.get_env_var("DEEPSEEK_API_KEY")
+            deepseek_base_url = config.get_env_var("DEEPSEEK_API_URL")
             
             if not deepseek_api_key or not deepseek_base_url:
                 raise ValueError("DEEPSEEK_API_KEY and DEEPSEEK_API_URL must be set when using DeepSeek")
@@ -229,6 +367,16 @@ class AIProcessor:
         if not self.client:
             raise ValueError("No AI client could be initialized. Please enable at least one AI provider and provide valid credentials.")
 
+        # "two_step" (summary, then graph) or "single_call" (both from one structured response)
+        self.pipeline_mode = config.get_env_var("AI_PIPELINE_MODE", "two_step")
+        if self.pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"AI_PIPELINE_MODE must be one of {', '.join(PIPELINE_MODES)}")
+
+    @property
+    def provider(self) -> str:
+        """Name of the active AI provider, used to label metrics"""
+        return self.client.provider_name
+
     def _validate_text(self, text: str) -> str:
         """Validate and truncate text if necessary"""
         try:
@@ -241,7 +389,7 @@ class AIProcessor:
             for pattern in number_patterns:
                 matches = re.finditer(pattern, text)
                 for match in matches:
-                    logger.warning(f"Potentially malformed number detected: '{match.group()}' at position {match.start()}")
+                    logger.debug("Potentially malformed number detected: '%s' at position %d", match.group(), match.start())
             
             max_length = 6000  # Use the same max length for both clients
             if len(text) > max_length:
@@ -268,4 +416,13 @@ class AIProcessor:
             return await self.client.generate_graph_json(validated_text)
         except Exception as e:
             logger.error(f"Error generating graph JSON: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def generate_summary_and_graph(self, raw_text: str) -> Tuple[str, Dict[str, Any]]:
+        """Generate the comprehensive text and graph JSON from raw PDF text in one request"""
+        try:
+            validated_text = self._validate_text(raw_text)
+            return await self.client.generate_summary_and_graph(validated_text)
+        except Exception as e:
+            logger.error(f"Error generating summary and graph: {str(e)}")
+            raise
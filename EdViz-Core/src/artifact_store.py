@@ -0,0 +1,247 @@
+"""
+Content-addressed artifact store for uploaded PDFs and rendered SVGs.
+
+Objects are stored once under their sha256 digest and referenced through
+small alias files (e.g. "svg/<file_id>" -> digest), so identical uploads
+and renders share storage. Pointing ARTIFACT_STORE_DIR at a shared volume
+makes artifacts available to every worker and replica.
+
+Retention is based on last use: reading or re-writing an object refreshes
+its modification time, objects unused for longer than the TTL are removed,
+and the least recently used objects are evicted while the store is over
+its byte quota. Aliases whose object is gone are removed with it.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from config import config
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_WRITES = registry.counter(
+    "edviz_artifact_writes_total",
+    "Artifact writes, by whether the content was already stored",
+    ("outcome",),
+)
+ARTIFACT_EVICTIONS = registry.counter(
+    "edviz_artifact_evictions_total",
+    "Artifacts removed by the garbage collector",
+    ("reason",),
+)
+ARTIFACT_BYTES = registry.gauge(
+    "edviz_artifact_store_bytes",
+    "Bytes held by the artifact store after the last garbage collection",
+)
+
+_ALIAS_PATTERN = re.compile(r"^[A-Za-z0-9_-]+(/[A-Za-z0-9][A-Za-z0-9_.-]*)+$")
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_CHUNK_SIZE = 1 << 16
+# Partial writes older than this are left over from crashed workers
+_STALE_TEMP_SECONDS = 3600
+
+
+class ArtifactStore:
+    """Deduplicating file store with TTL and LRU retention under a byte quota"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or config.get_env_var("ARTIFACT_STORE_DIR", str(config.root_dir / "artifacts")))
+        self.max_bytes = config.get_int("ARTIFACT_MAX_BYTES", 2 * 1024 ** 3)
+        self.ttl_seconds = config.get_float("ARTIFACT_TTL_HOURS", 168) * 3600
+        self.gc_interval = config.get_float("ARTIFACT_GC_INTERVAL_SECONDS", 300)
+
+        self.objects_dir = self.root / "objects"
+        self.aliases_dir = self.root / "aliases"
+        self.tmp_dir = self.root / "tmp"
+        for directory in (self.objects_dir, self.aliases_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self._gc_task: Optional[asyncio.Task] = None
+
+    # Objects
+
+    def _object_path(self, digest: str) -> Path:
+        if not _DIGEST_PATTERN.match(digest):
+            raise ValueError(f"Invalid artifact digest: '{digest}'")
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _store(self, chunks: Iterable[bytes]) -> str:
+        """Write chunks to a temporary file, then move it into place under its digest"""
+        hasher = hashlib.sha256()
+        tmp_path = self.tmp_dir / uuid.uuid4().hex
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+            path = self._object_path(digest)
+            if path.exists():
+                os.utime(path)
+                ARTIFACT_WRITES.inc(outcome="deduplicated")
+            else:
+                path.parent.mkdir(exist_ok=True)
+                # Atomic on the same filesystem, so readers never see partial objects
+                os.replace(tmp_path, path)
+                ARTIFACT_WRITES.inc(outcome="stored")
+            return digest
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def put_bytes(self, data: bytes) -> str:
+        """Store content and return its digest"""
+        return self._store([data])
+
+    def put_file(self, source: Path) -> str:
+        """Copy a file into the store and return its digest"""
+        def chunks():
+            with open(source, "rb") as f:
+                while chunk := f.read(_CHUNK_SIZE):
+                    yield chunk
+        return self._store(chunks())
+
+    def path(self, digest: str) -> Optional[Path]:
+        """Filesystem path of a stored object (marking it as used), or None if it is gone"""
+        path = self._object_path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_bytes(self, digest: str) -> Optional[bytes]:
+        path = self.path(digest)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    # Aliases
+
+    def _alias_path(self, alias: str) -> Path:
+        if not _ALIAS_PATTERN.match(alias):
+            raise ValueError(f"Invalid artifact alias: '{alias}'")
+        return self.aliases_dir / alias
+
+    def link(self, alias: str, digest: str) -> None:
+        """Point an alias (e.g. "svg/<file_id>") at a stored object"""
+        path = self._alias_path(alias)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.tmp_dir / uuid.uuid4().hex
+        tmp_path.write_text(digest, encoding="ascii")
+        os.replace(tmp_path, path)
+
+    def resolve(self, alias: str) -> Optional[str]:
+        """Digest an alias points at, or None if the alias or its object is gone"""
+        try:
+            digest = self._alias_path(alias).read_text(encoding="ascii").strip()
+        except FileNotFoundError:
+            return None
+        return digest if self._object_path(digest).exists() else None
+
+    def open_alias(self, alias: str) -> Optional[Path]:
+        """Object path behind an alias, marking it as used"""
+        digest = self.resolve(alias)
+        return self.path(digest) if digest else None
+
+    # Retention
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """Remove expired objects, evict LRU objects over the quota and drop dangling aliases"""
+        now = time.time()
+        stats = {"expired": 0, "evicted": 0, "aliases_removed": 0, "freed_bytes": 0}
+
+        objects = []
+        for path in self.objects_dir.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+        objects.sort()
+
+        def remove(mtime: float, size: int, path: Path) -> bool:
+            # Re-check right before deleting: another worker may have just used the object
+            try:
+                if path.stat().st_mtime > mtime:
+                    return False
+                path.unlink()
+            except FileNotFoundError:
+                return False
+            stats["freed_bytes"] += size
+            return True
+
+        total = sum(size for _, size, _ in objects)
+        kept = []
+        for mtime, size, path in objects:
+            if now - mtime > self.ttl_seconds and remove(mtime, size, path):
+                stats["expired"] += 1
+                total -= size
+            else:
+                kept.append((mtime, size, path))
+
+        for mtime, size, path in kept:
+            if total <= self.max_bytes:
+                break
+            if remove(mtime, size, path):
+                stats["evicted"] += 1
+                total -= size
+
+        for alias_path in self.aliases_dir.rglob("*"):
+            if not alias_path.is_file():
+                continue
+            try:
+                digest = alias_path.read_text(encoding="ascii").strip()
+                dangling = not self._object_path(digest).exists()
+            except (FileNotFoundError, ValueError):
+                dangling = True
+            if dangling:
+                alias_path.unlink(missing_ok=True)
+                stats["aliases_removed"] += 1
+
+        for tmp_path in self.tmp_dir.iterdir():
+            try:
+                if now - tmp_path.stat().st_mtime > _STALE_TEMP_SECONDS:
+                    tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+
+        ARTIFACT_EVICTIONS.inc(stats["expired"], reason="ttl")
+        ARTIFACT_EVICTIONS.inc(stats["evicted"], reason="quota")
+        ARTIFACT_BYTES.set(total)
+        return stats
+
+    async def start(self) -> None:
+        """Start the periodic garbage collector"""
+        if self._gc_task is None:
+            self._gc_task = asyncio.create_task(self._run_gc())
+            logger.info("Artifact store garbage collector started for %s", self.root)
+
+    async def stop(self) -> None:
+        if self._gc_task is None:
+            return
+        self._gc_task.cancel()
+        try:
+            await self._gc_task
+        except asyncio.CancelledError:
+            pass
+        self._gc_task = None
+
+    async def _run_gc(self) -> None:
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.collect_garbage)
+                if stats["expired"] or stats["evicted"] or stats["aliases_removed"]:
+                    logger.info("Artifact store garbage collection: %s", stats)
+            except Exception as e:
+                logger.error("Artifact store garbage collection failed: %s", e)
+            await asyncio.sleep(self.gc_interval)
@@ -0,0 +1,93 @@
+"""
+Benchmark the PDF extraction backends on a corpus of PDFs.
+
+For every document and backend this reports pages/second and text fidelity
+relative to pdfplumber (bag-of-words F1 over the cleaned text), plus the
+backend the automatic selection would pick.
+
+Usage:
+    python src/benchmark_pdf_extraction.py path/to/corpus [--repeat 3]
+"""
+import argparse
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from pdf_processor import EXTRACTORS, PDFProcessor, text_quality
+
+
+def word_f1(reference: str, candidate: str) -> float:
+    """Bag-of-words F1 between two texts (1.0 = same words with the same counts)"""
+    ref = Counter(re.findall(r"\w+", reference.lower()))
+    cand = Counter(re.findall(r"\w+", candidate.lower()))
+    if not ref and not cand:
+        return 1.0
+    overlap = sum((ref & cand).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def benchmark_file(processor: PDFProcessor, pdf_path: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    texts: Dict[str, str] = {}
+    for name, extractor_cls in EXTRACTORS.items():
+        if not extractor_cls.is_available():
+            continue
+        extractor = extractor_cls()
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pages, page_count = extractor.extract_pages(pdf_path)
+            best = min(best, time.perf_counter() - start)
+        texts[name] = processor.clean_text("\n".join(pages))
+        results[name] = {
+            "seconds": best,
+            "pages_per_second": page_count / best if best > 0 else float("inf"),
+            "quality": text_quality(pages),
+        }
+
+    reference = texts.get("pdfplumber", "")
+    for name, text in texts.items():
+        results[name]["fidelity"] = word_f1(reference, text)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, help="PDF file or directory of PDFs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend (best time is reported)")
+    args = parser.parse_args()
+
+    files: List[Path] = sorted(args.corpus.glob("**/*.pdf")) if args.corpus.is_dir() else [args.corpus]
+    if not files:
+        parser.error(f"No PDF files found in {args.corpus}")
+
+    processor = PDFProcessor()
+    totals: Dict[str, List[float]] = {}
+
+    print(f"{'file':40} {'backend':12} {'pages/s':>10} {'quality':>8} {'fidelity':>9}  auto")
+    for pdf_path in files:
+        results = benchmark_file(processor, pdf_path, args.repeat)
+        selected = processor.extract_pages(pdf_path)[2]
+        for name, stats in results.items():
+            print(f"{pdf_path.name[:40]:40} {name:12} {stats['pages_per_second']:10.1f} "
+                  f"{stats['quality']:8.3f} {stats['fidelity']:9.3f}  {'*' if name == selected else ''}")
+            totals.setdefault(name, []).append(stats["pages_per_second"])
+            totals.setdefault(f"{name}_fidelity", []).append(stats["fidelity"])
+
+    print()
+    for name in EXTRACTORS:
+        if name in totals:
+            speeds = totals[name]
+            fidelities = totals[f"{name}_fidelity"]
+            print(f"{name:12} mean pages/s {sum(speeds) / len(speeds):10.1f}   "
+                  f"mean fidelity {sum(fidelities) / len(fidelities):.3f}")
+
+
+if __name__ == "__main__":
+    main()
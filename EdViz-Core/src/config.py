@@ -14,25 +14,21 @@ class Config:
         # Define all important directories
         self.src_dir = self.root_dir / "src"
         self.output_dir = self.root_dir / "output"
-        self.uploads_dir = self.root_dir / "uploads"
         
         # Define all important files
         self.env_file = self.root_dir / ".env"
         self.graph_json_file = self.root_dir / "graph_representations.json"
         self.log_file = self.root_dir / "app.log"
         
-        # Create necessary directories
-        self._create_directories()
-        
-        # Load environment variables
+        # Load environment variables (the only place .env is read)
         self._load_env()
         
         # Store environment variables
         self.env_vars: Dict[str, Any] = {}
 
-    def _create_directories(self) -> None:
-        """Create necessary directories if they don't exist"""
-        directories = [self.output_dir, self.uploads_dir]
+    def ensure_directories(self) -> None:
+        """Create necessary directories if they don't exist (called once at startup)"""
+        directories = [self.output_dir]
         for directory in directories:
             directory.mkdir(exist_ok=True)
             logger.info(f"Ensured directory exists: {directory}")
@@ -55,6 +51,18 @@ class Config:
         self.env_vars[key] = value
         return value
 
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """Get a boolean environment variable ("true"/"false")"""
+        return str(self.get_env_var(key, str(default))).lower() == "true"
+
+    def get_int(self, key: str, default: int) -> int:
+        """Get an integer environment variable"""
+        return int(self.get_env_var(key, str(default)))
+
+    def get_float(self, key: str, default: float) -> float:
+        """Get a float environment variable"""
+        return float(self.get_env_var(key, str(default)))
+
     def get_file_path(self, file_type: str) -> Path:
         """Get the path for a specific file type"""
         file_paths = {
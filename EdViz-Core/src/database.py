@@ -1,29 +1,45 @@
+from functools import lru_cache
 from sqlmodel import create_engine, Session
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DB_USERNAME = os.getenv("DB_USERNAME")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-if not DB_USERNAME:
-    raise ValueError("DB_USERNAME environment variable is not set")
-if not DB_PASSWORD:
-    raise ValueError("DB_PASSWORD environment variable is not set")
-if not DB_HOST:
-    raise ValueError("DB_HOST environment variable is not set")
-if not DB_PORT:
-    raise ValueError("DB_PORT environment variable is not set")
-if not DB_NAME:
-    raise ValueError("DB_NAME environment variable is not set")
-
-
-DATABASE_URL = f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL, echo=True)
+from sqlalchemy.engine import Engine
+
+from config import config
+
+
+def get_database_url() -> str:
+    """Build the database URL from configuration, failing fast on missing settings"""
+    settings = {}
+    for key in ("DB_USERNAME", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"):
+        value = config.get_env_var(key)
+        if not value:
+            raise ValueError(f"{key} environment variable is not set")
+        settings[key] = value
+
+    return (
+        f"postgresql://{settings['DB_USERNAME']}:{settings['DB_PASSWORD']}"
+        f"@{settings['DB_HOST']}:{settings['DB_PORT']}/{settings['DB_NAME']}"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Create the shared engine on first use instead of at import time"""
+    return create_engine(
+        get_database_url(),
+        # SQL echo logs every statement synchronously, so keep it opt-in
+        echo=config.get_bool("DB_ECHO", False),
+        pool_size=config.get_int("DB_POOL_SIZE", 5),
+        max_overflow=config.get_int("DB_MAX_OVERFLOW", 10),
+        pool_pre_ping=True,
+    )
+
+
+def dispose_engine() -> None:
+    """Close pooled connections if the engine was ever created"""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+        get_engine.cache_clear()
+
 
 def get_session():
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
@@ -1,61 +1,343 @@
+import asyncio
 import smtplib
+from collections import deque
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
-from dotenv import load_dotenv
+import time
+import uuid
 import logging
+from typing import Any, Deque, Dict, List, Optional
+
+from config import config
+from metrics import registry, RETRIES
 
 logger = logging.getLogger(__name__)
 
+EMAILS = registry.counter(
+    "edviz_emails_total",
+    "Contact form emails processed by the outbox, by outcome",
+    ("outcome",),
+)
+OUTBOX_DEPTH = registry.gauge(
+    "edviz_email_outbox_depth",
+    "Number of contact form emails waiting in the outbox",
+)
+
+
+class OutboxFullError(Exception):
+    """Raised when the email outbox cannot accept more messages"""
+
+
+class EmailNotConfiguredError(Exception):
+    """Raised when SMTP credentials or the team address are missing"""
+
+
+@dataclass
+class OutboxMessage:
+    """A contact form submission waiting to be delivered"""
+    name: str
+    email: str
+    subject: str
+    message: str
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_error: Optional[str] = None
+
+
 class EmailService:
     def __init__(self):
-        # Load environment variables
-        load_dotenv()
-        
         # Email configuration
-        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        self.smtp_username = os.getenv('SMTP_USERNAME')
-        self.smtp_password = os.getenv('SMTP_PASSWORD')
-        self.team_email = os.getenv('TEAM_EMAIL')
-        
-        if not all([self.smtp_username, self.smtp_password, self.team_email]):
+        self.smtp_server = config.get_env_var('SMTP_SERVER', 'smtp.gmail.com')
+        self.smtp_port = config.get_int('SMTP_PORT', 587)
+        self.smtp_username = config.get_env_var('SMTP_USERNAME')
+        self.smtp_password = config.get_env_var('SMTP_PASSWORD')
+        self.team_email = config.get_env_var('TEAM_EMAIL')
+        self.smtp_use_tls = config.get_bool('SMTP_USE_TLS', True)
+        self.smtp_timeout = config.get_float('SMTP_TIMEOUT', 30)
+
+        # Reused authenticated connection (only touched from one thread at a time)
+        self._connection: Optional[smtplib.SMTP] = None
+
+        if not self.is_configured:
             logger.warning("Email configuration is incomplete. Contact form will not work.")
-    
-    def send_contact_email(self, name: str, email: str, subject: str, message: str) -> bool:
-        """
-        Send a contact form email to the team
-        """
-        try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.smtp_username
-            msg['To'] = self.team_email
-            msg['Reply-To'] = email
-            msg['Subject'] = f"Contact Form: {subject}"
-            
-            # Create email body
-            body = f"""
+
+    @property
+    def is_configured(self) -> bool:
+        """A team address is required; credentials are optional but must come as a pair"""
+        return bool(self.team_email) and bool(self.smtp_username) == bool(self.smtp_password)
+
+    def build_contact_message(self, name: str, email: str, subject: str, message: str) -> MIMEMultipart:
+        """Build the email sent to the team for a contact form submission"""
+        msg = MIMEMultipart()
+        msg['From'] = self.smtp_username or self.team_email
+        msg['To'] = self.team_email
+        msg['Reply-To'] = email
+        msg['Subject'] = f"Contact Form: {subject}"
+
+        # Create email body
+        body = f"""
             New contact form submission:
-            
+
             From: {name} <{email}>
             Subject: {subject}
-            
+
             Message:
             {message}
             """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Connect to SMTP server and send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        try:
+            if self.smtp_use_tls:
                 server.starttls()
+            if self.smtp_username and self.smtp_password:
                 server.login(self.smtp_username, self.smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Contact form email sent successfully from {email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send contact form email: {str(e)}")
-            return False 
\ No newline at end of file
+        except Exception:
+            server.close()
+            raise
+        logger.info("Opened SMTP connection to %s:%s", self.smtp_server, self.smtp_port)
+        return server
+
+    def _get_connection(self) -> smtplib.SMTP:
+        """Return the cached SMTP connection, reconnecting if it went stale"""
+        if self._connection is not None:
+            try:
+                status, _ = self._connection.noop()
+                if status == 250:
+                    return self._connection
+            except (smtplib.SMTPException, OSError):
+                # Includes sockets reset or timed out by the server while idle
+                pass
+            self.close()
+        self._connection = self._connect()
+        return self._connection
+
+    def close(self) -> None:
+        """Close the cached SMTP connection if there is one"""
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except Exception:
+            self._connection.close()
+        self._connection = None
+
+    def send_batch(self, messages: List[OutboxMessage]) -> Dict[str, Optional[str]]:
+        """
+        Send a batch of contact emails over a single reused connection.
+        Returns a mapping of message id to error text (None when sent).
+        """
+        results: Dict[str, Optional[str]] = {}
+        for item in messages:
+            msg = self.build_contact_message(item.name, item.email, item.subject, item.message)
+            try:
+                self._get_connection().send_message(msg)
+                results[item.id] = None
+            except Exception as e:
+                # Drop the connection so the next message starts from a clean session
+                self.close()
+                results[item.id] = str(e)
+        return results
+
+
+class EmailOutbox:
+    """
+    In-process outbox for contact form emails.
+
+    Submissions are enqueued and acknowledged immediately; a background
+    worker delivers them in batches over a reused SMTP connection, retries
+    failures with exponential backoff and moves messages that keep failing
+    to a dead-letter list.
+    """
+
+    def __init__(self, email_service: EmailService):
+        self.email_service = email_service
+        self.max_queue_size = config.get_int('EMAIL_OUTBOX_SIZE', 1000)
+        self.batch_size = config.get_int('EMAIL_BATCH_SIZE', 20)
+        self.max_attempts = config.get_int('EMAIL_MAX_ATTEMPTS', 5)
+        self.backoff_base = config.get_float('EMAIL_BACKOFF_BASE', 2)
+        self.backoff_max = config.get_float('EMAIL_BACKOFF_MAX', 300)
+        self.idle_timeout = config.get_float('EMAIL_IDLE_TIMEOUT', 60)
+        self.dead_letters: Deque[OutboxMessage] = deque(maxlen=config.get_int('EMAIL_DEAD_LETTER_SIZE', 1000))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Messages waiting out their backoff, keyed by the task that will requeue them
+        self._retry_tasks: Dict[asyncio.Task, OutboxMessage] = {}
+        # SMTP work runs in a thread that cancelling the worker cannot interrupt,
+        # so the current call and its batch are tracked for stop()
+        self._smtp_call: Optional[asyncio.Future] = None
+        self._sending: List[OutboxMessage] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def enqueue(self, name: str, email: str, subject: str, message: str) -> OutboxMessage:
+        """Queue a contact form submission for background delivery"""
+        if self._queue is None:
+            raise RuntimeError("Email outbox has not been started")
+        # Fail fast instead of acknowledging messages that can never be delivered
+        if not self.email_service.is_configured:
+            raise EmailNotConfiguredError("Email configuration is incomplete")
+        item = OutboxMessage(name=name, email=email, subject=subject, message=message)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            raise OutboxFullError("Email outbox is full")
+        OUTBOX_DEPTH.set(self.depth)
+        return item
+
+    async def start(self) -> None:
+        """Start the background delivery worker"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("Email outbox worker started")
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Try to flush pending messages, then stop the worker and close the connection"""
+        if self._worker is None:
+            return
+        # Give messages in backoff one more attempt instead of dropping them with their timers
+        undelivered: List[OutboxMessage] = []
+        for task, item in list(self._retry_tasks.items()):
+            task.cancel()
+            del self._retry_tasks[task]
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                undelivered.append(item)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        # A send interrupted by the cancellation is still running in its thread
+        connection_busy = False
+        if self._smtp_call is not None:
+            try:
+                results = await asyncio.wait_for(asyncio.shield(self._smtp_call),
+                                                 timeout=self.email_service.smtp_timeout)
+            except asyncio.TimeoutError:
+                connection_busy = True
+                results = {item.id: "Send still running at shutdown" for item in self._sending}
+            except Exception as e:
+                results = {item.id: str(e) for item in self._sending}
+            for item in self._sending:
+                if (results or {}).get(item.id) is None:
+                    EMAILS.inc(outcome="sent")
+                    logger.info("Contact form email %s sent successfully from %s", item.id, item.email)
+                else:
+                    undelivered.append(item)
+            self._smtp_call = None
+            self._sending = []
+
+        # Messages that failed again while draining are still waiting out a backoff
+        for task, item in list(self._retry_tasks.items()):
+            task.cancel()
+            undelivered.append(item)
+        self._retry_tasks.clear()
+        while not self._queue.empty():
+            undelivered.append(self._queue.get_nowait())
+        if undelivered:
+            logger.warning("Email outbox stopped with %d undelivered messages: %s",
+                           len(undelivered), ", ".join(item.id for item in undelivered))
+        if connection_busy:
+            # Closing now would use the SMTP connection from two threads at once
+            logger.warning("SMTP send still running at shutdown, leaving its connection open")
+        else:
+            await asyncio.to_thread(self.email_service.close)
+
+    def _next_batch(self, first: OutboxMessage) -> List[OutboxMessage]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Nothing to send for a while, release the SMTP session
+                await self._run_smtp(self.email_service.close)
+                continue
+
+            batch = self._next_batch(first)
+            OUTBOX_DEPTH.set(self.depth)
+            self._sending = batch
+            try:
+                results = await self._run_smtp(self.email_service.send_batch, batch)
+            except Exception as e:
+                results = {item.id: str(e) for item in batch}
+            self._sending = []
+
+            for item in batch:
+                error = results.get(item.id)
+                if error is None:
+                    EMAILS.inc(outcome="sent")
+                    logger.info("Contact form email %s sent successfully from %s", item.id, item.email)
+                else:
+                    self._handle_failure(item, error)
+                self._queue.task_done()
+
+    async def _run_smtp(self, func, *args):
+        """Run an SMTP call in a thread; cancelling the caller leaves the call running for stop() to await"""
+        self._smtp_call = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        try:
+            result = await asyncio.shield(self._smtp_call)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._smtp_call = None
+            raise
+        self._smtp_call = None
+        return result
+
+    def _handle_failure(self, item: OutboxMessage, error: str) -> None:
+        item.attempts += 1
+        item.last_error = error
+        if item.attempts >= self.max_attempts:
+            self.dead_letters.append(item)
+            EMAILS.inc(outcome="dead_lettered")
+            logger.error("Contact form email %s moved to dead letters after %d attempts: %s", item.id, item.attempts, error)
+            return
+
+        delay = min(self.backoff_max, self.backoff_base ** item.attempts)
+        EMAILS.inc(outcome="retried")
+        RETRIES.inc(provider="smtp", reason="send_failed")
+        logger.warning("Failed to send contact form email %s (attempt %d/%d), retrying in %.1fs: %s",
+                       item.id, item.attempts, self.max_attempts, delay, error)
+        task = asyncio.create_task(self._requeue_later(item, delay))
+        self._retry_tasks[task] = item
+        task.add_done_callback(lambda done: self._retry_tasks.pop(done, None))
+
+    async def _requeue_later(self, item: OutboxMessage, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._queue.put(item)
+        OUTBOX_DEPTH.set(self.depth)
+
+    def stats(self) -> Dict[str, Any]:
+        """Outbox counters for /health (dead letters are counted, not listed, to keep addresses private)"""
+        return {
+            "queued": self.depth,
+            "retrying": len(self._retry_tasks),
+            "dead_letters": len(self.dead_letters),
+            "last_dead_letter_error": self.dead_letters[-1].last_error if self.dead_letters else None,
+        }
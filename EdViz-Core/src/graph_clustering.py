@@ -0,0 +1,198 @@
+"""
+Level-of-detail views of large concept graphs.
+
+Nodes are grouped into clusters (by their `group` field, or by label
+propagation over the links when groups are missing), and every cluster
+that is not expanded is collapsed into a single summary node. Links are
+re-pointed at the summary nodes and merged, so an overview of a graph with
+hundreds of concepts renders as a few dozen Mermaid nodes. Expanded
+clusters are drawn as Mermaid subgraphs.
+"""
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import config
+
+DETAIL_LEVELS = ("auto", "full", "clusters")
+
+# Prefix for summary node ids, chosen so it cannot clash with sanitized concept ids
+CLUSTER_NODE_PREFIX = "__cluster_"
+
+
+@dataclass
+class GraphView:
+    graph: Dict[str, Any]
+    detail: str
+    clusters: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def label_propagation(node_ids: List[str], links: List[Dict[str, Any]], max_iterations: int = 20) -> Dict[str, str]:
+    """
+    Community detection by label propagation: each node repeatedly adopts
+    the most common label among its neighbours. Nodes are visited in a fixed
+    order and ties keep the current (or smallest) label, so the result is
+    deterministic and cluster ids stay stable between requests.
+    """
+    known = set(node_ids)
+    neighbours: Dict[str, List[str]] = {node_id: [] for node_id in node_ids}
+    for link in links:
+        source, target = link.get("source"), link.get("target")
+        if source in known and target in known and source != target:
+            neighbours[source].append(target)
+            neighbours[target].append(source)
+
+    labels = {node_id: node_id for node_id in node_ids}
+    order = sorted(node_ids)
+    for _ in range(max_iterations):
+        changed = False
+        for node_id in order:
+            if not neighbours[node_id]:
+                continue
+            counts = Counter(labels[other] for other in neighbours[node_id])
+            best = max(counts.values())
+            if counts.get(labels[node_id]) == best:
+                continue
+            labels[node_id] = min(label for label, count in counts.items() if count == best)
+            changed = True
+        if not changed:
+            break
+    return labels
+
+
+def assign_clusters(
+    nodes: List[Dict[str, Any]],
+    links: List[Dict[str, Any]],
+    max_clusters: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Map node ids to cluster ids, preferring the LLM-assigned `group` field.
+
+    Groups are only used when they actually summarize the graph: at most
+    `max_clusters` of them and no more than one per two nodes (LLMs often
+    give every node its own group). Otherwise communities are found by label
+    propagation, and the smallest ones are merged so that at most
+    `max_clusters` clusters remain.
+    """
+    limit = max(2, len(nodes) // 2)
+    if max_clusters is not None:
+        limit = max(2, min(limit, max_clusters))
+
+    groups = [node.get("group") for node in nodes]
+    if all(group is not None for group in groups) and 1 < len(set(map(str, groups))) <= limit:
+        return {node["id"]: str(node["group"]) for node in nodes}
+
+    labels = label_propagation([node["id"] for node in nodes], links)
+    members: Dict[str, List[str]] = defaultdict(list)
+    for node_id, label in labels.items():
+        members[label].append(node_id)
+    # Number communities by size so the ids read naturally ("c0" is the largest)
+    ordered = sorted(members.values(), key=lambda ids: (-len(ids), min(ids)))
+    if len(ordered) > limit:
+        # Sparse graphs leave many tiny communities; fold them into the last cluster
+        ordered = ordered[:limit - 1] + [[node_id for ids in ordered[limit - 1:] for node_id in ids]]
+    return {node_id: f"c{index}" for index, ids in enumerate(ordered) for node_id in ids}
+
+
+def build_view(
+    graph_json: Dict[str, Any],
+    detail: str = "auto",
+    expand: Iterable[str] = (),
+    max_nodes: Optional[int] = None,
+    max_clusters: Optional[int] = None,
+) -> GraphView:
+    """
+    Graph JSON to render at the requested level of detail.
+
+    "full" keeps every node, "clusters" collapses every cluster not listed in
+    `expand`, and "auto" collapses only graphs with more than `max_nodes`
+    (LOD_MAX_NODES) nodes. Overviews have at most `max_clusters`
+    (LOD_MAX_CLUSTERS) clusters. Raises ValueError for unknown levels or clusters.
+    """
+    if max_nodes is None:
+        max_nodes = config.get_int("LOD_MAX_NODES", 150)
+    if max_clusters is None:
+        max_clusters = config.get_int("LOD_MAX_CLUSTERS", 30)
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of {', '.join(DETAIL_LEVELS)}")
+    nodes = graph_json.get("nodes", [])
+    links = graph_json.get("links", [])
+    if detail == "full" or (detail == "auto" and len(nodes) <= max_nodes):
+        return GraphView(graph=graph_json, detail="full")
+
+    membership = assign_clusters(nodes, links, min(max_clusters, max_nodes))
+    expand = set(expand)
+    unknown = expand - set(membership.values())
+    if unknown:
+        raise ValueError(f"Unknown cluster(s): {', '.join(sorted(unknown))}")
+
+    members: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for node in nodes:
+        members[membership[node["id"]]].append(node)
+    degree = Counter()
+    for link in links:
+        degree[link.get("source")] += 1
+        degree[link.get("target")] += 1
+
+    view_nodes: List[Dict[str, Any]] = []
+    subgraphs: List[Dict[str, Any]] = []
+    clusters: List[Dict[str, Any]] = []
+    shown_as: Dict[str, str] = {}
+    for key, cluster_nodes in members.items():
+        # The most connected concept names the cluster
+        representative = max(cluster_nodes, key=lambda node: degree[node["id"]])
+        expanded = key in expand or len(cluster_nodes) == 1
+        clusters.append({
+            "id": key,
+            "label": representative.get("name", representative["id"]),
+            "size": len(cluster_nodes),
+            "expanded": expanded
+        })
+        if expanded:
+            view_nodes.extend(cluster_nodes)
+            shown_as.update((node["id"], node["id"]) for node in cluster_nodes)
+            if len(cluster_nodes) > 1:
+                subgraphs.append({
+                    "id": f"{CLUSTER_NODE_PREFIX}{key}",
+                    "name": representative.get("name", key),
+                    "nodes": [node["id"] for node in cluster_nodes]
+                })
+        else:
+            summary_id = f"{CLUSTER_NODE_PREFIX}{key}"
+            view_nodes.append({
+                "id": summary_id,
+                "name": f"{representative.get('name', key)} (+{len(cluster_nodes) - 1} more)",
+                "group": representative.get("group"),
+                "cluster": key,
+                "collapsed": True
+            })
+            shown_as.update((node["id"], summary_id) for node in cluster_nodes)
+
+    view_links: List[Dict[str, Any]] = []
+    merged: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for link in links:
+        source, target = shown_as.get(link.get("source")), shown_as.get(link.get("target"))
+        if source is None or target is None:
+            continue
+        if source == link["source"] and target == link["target"]:
+            view_links.append(link)
+        elif source != target:
+            merged[(source, target)].append(link)
+
+    for (source, target), group in merged.items():
+        if len(group) == 1:
+            view_links.append({**group[0], "source": source, "target": target})
+        else:
+            types = Counter(link.get("type", "") for link in group)
+            view_links.append({
+                "source": source,
+                "target": target,
+                "type": f"{len(group)} links",
+                "description": ", ".join(f"{name} ({count})" for name, count in types.most_common(3))
+            })
+
+    return GraphView(
+        graph={"nodes": view_nodes, "links": view_links, "subgraphs": subgraphs},
+        detail="clusters",
+        clusters=clusters
+    )
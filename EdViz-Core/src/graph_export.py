@@ -0,0 +1,112 @@
+"""
+Constant-memory export of stored graphs as NDJSON (optionally gzip-compressed).
+
+Rows are read through a server-side cursor in small batches and written out
+as they arrive, so memory stays flat and the first line is produced as soon
+as the first batch is fetched.
+
+Usage:
+    python src/graph_export.py --since 2024-01-01 --gzip -o graphs.ndjson.gz
+"""
+import argparse
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlmodel import Session, select
+
+from database import get_engine
+from models import Graph
+
+EXPORT_BATCH_SIZE = 500
+
+# Only the exported columns are selected; search_vector and ORM identity tracking are skipped
+EXPORT_COLUMNS = (Graph.id, Graph.title, Graph.summary_text, Graph.graph_data, Graph.created_at, Graph.version)
+
+
+def iter_graph_records(
+    session: Session,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Yield graphs as plain dicts, oldest first, using a server-side cursor"""
+    query = select(*EXPORT_COLUMNS).order_by(Graph.created_at, Graph.id)
+    if since is not None:
+        query = query.where(Graph.created_at >= since)
+    if until is not None:
+        query = query.where(Graph.created_at < until)
+
+    result = session.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for row in result:
+        yield {
+            "id": str(row.id),
+            "title": row.title,
+            "summary_text": row.summary_text,
+            "graph_data": row.graph_data,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "version": row.version,
+        }
+
+
+def iter_ndjson(records: Iterable[dict], flush_every: int = 100) -> Iterator[bytes]:
+    """Encode records as NDJSON, emitting a chunk every `flush_every` lines"""
+    buffer = []
+    for record in records:
+        buffer.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        if len(buffer) >= flush_every:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Incrementally gzip a stream of byte chunks"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """
+    Stream every matching graph as NDJSON bytes.
+    Opens its own session so it can outlive the request handler that started it.
+    """
+    with Session(get_engine()) as session:
+        chunks = iter_ndjson(iter_graph_records(session, since, until))
+        if compress:
+            chunks = iter_gzip(chunks)
+        yield from chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export graphs as NDJSON")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only graphs created at or after this time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only graphs created before this time")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+    parser.add_argument("-o", "--output", help="Output file (defaults to stdout)")
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream_export(args.since, args.until, args.gzip):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,54 @@
+import hashlib
 import json
 import subprocess
+import uuid
 from pathlib import Path
 import os
 from typing import Dict, Any, Optional
 
+from config import config
+from metrics import CACHE_HITS, CACHE_MISSES
+
 class GraphGenerator:
     def __init__(self):
-        self.output_dir = Path("output")
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir = config.output_dir
         self.graph_data: Optional[Dict[str, Any]] = None
 
     def _convert_to_mermaid(self, graph_json: Dict[str, Any]) -> str:
         """Convert graph JSON to Mermaid format"""
         mermaid_lines = ["graph TD"]
-        
+
+        def sanitize(value: str) -> str:
+            return value.replace(" ", "_").replace("-", "_").replace("(", "").replace(")", "")
+
+        def node_line(node: Dict[str, Any], indent: str = "    ") -> str:
+            node_id = sanitize(node["id"])
+            node_name = node["name"]
+            # Collapsed clusters (see graph_clustering) are drawn as subroutine boxes
+            if node.get("collapsed"):
+                return f'{indent}{node_id}[["{node_name}"]]'
+            return f'{indent}{node_id}["{node_name}"]'
+
+        # Nodes of expanded clusters are drawn inside their subgraph
+        subgraphs = graph_json.get("subgraphs", [])
+        in_subgraph = {node_id for subgraph in subgraphs for node_id in subgraph["nodes"]}
+        nodes_by_id = {node["id"]: node for node in graph_json["nodes"]}
+
         # Add nodes with sanitized IDs
         for node in graph_json["nodes"]:
-            node_id = node["id"].replace(" ", "_").replace("-", "_").replace("(", "").replace(")", "")
-            node_name = node["name"]
-            mermaid_lines.append(f'    {node_id}["{node_name}"]')
-        
+            if node["id"] not in in_subgraph:
+                mermaid_lines.append(node_line(node))
+
+        for subgraph in subgraphs:
+            mermaid_lines.append(f'    subgraph {sanitize(subgraph["id"])}["{subgraph["name"]}"]')
+            for node_id in subgraph["nodes"]:
+                mermaid_lines.append(node_line(nodes_by_id[node_id], "        "))
+            mermaid_lines.append("    end")
+
         # Add edges using sanitized IDs
         for edge in graph_json["links"]:
-            source = edge["source"].replace(" ", "_").replace("-", "_").replace("(", "").replace(")", "")
-            target = edge["target"].replace(" ", "_").replace("-", "_").replace("(", "").replace(")", "")
+            source = sanitize(edge["source"])
+            target = sanitize(edge["target"])
             edge_type = edge["type"]
             mermaid_lines.append(f'    {source} -->|{edge_type}| {target}')
         
@@ -68,6 +93,37 @@ class GraphGenerator:
             print(f"Error generating SVG: {str(e)}")
             raise
 
+    def render_to_store(self, graph_json: Dict[str, Any], store) -> Optional[str]:
+        """
+        Render graph JSON into the artifact store and return the SVG digest.
+        Renders are cached by the hash of the Mermaid source, so identical
+        graphs are only rendered once.
+        """
+        mermaid_content = self._convert_to_mermaid(graph_json)
+        render_alias = f"render/{hashlib.sha256(mermaid_content.encode('utf-8')).hexdigest()}"
+        use_cache = config.get_bool("ARTIFACT_RENDER_CACHE", True)
+        if use_cache:
+            digest = store.resolve(render_alias)
+            if digest:
+                CACHE_HITS.inc(cache="render")
+                return digest
+            CACHE_MISSES.inc(cache="render")
+
+        # Render into the scratch output directory, then keep only the stored copy
+        filename = str(uuid.uuid4())
+        try:
+            svg_path = self.generate_svg(graph_json, filename)
+            if not svg_path:
+                return None
+            digest = store.put_file(svg_path)
+        finally:
+            (self.output_dir / f"{filename}.svg").unlink(missing_ok=True)
+            (self.output_dir / f"{filename}.mmd").unlink(missing_ok=True)
+
+        if use_cache:
+            store.link(render_alias, digest)
+        return digest
+
 def main():
     """Main function to demonstrate usage"""
     try:
@@ -85,6 +141,7 @@ def main():
         }
         
         # Initialize the generator
+        config.ensure_directories()
         generator = GraphGenerator()
         
         # Generate SVG
@@ -0,0 +1,341 @@
+"""
+Bulk import of graphs from NDJSON (optionally gzip-compressed).
+
+Lines are validated and loaded in batches: every batch becomes one
+multi-row `INSERT ... ON CONFLICT (id) DO UPDATE` in its own transaction,
+so importing the same file twice is a no-op and a bad batch never affects
+the others. The accepted format is the one produced by graph_export.py.
+
+Usage:
+    python src/graph_import.py graphs.ndjson.gz [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import uuid
+import zlib
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from config import config
+from database import get_engine
+from metrics import registry
+from models import Graph
+from related_graphs import refresh_graph_concepts
+
+logger = logging.getLogger(__name__)
+
+# Each row binds 6 parameters; Postgres allows at most 65535 per statement
+MAX_BATCH_SIZE = 10000
+# Invalid lines listed per batch in the report (all of them are counted)
+MAX_REPORTED_ERRORS = 20
+# Upper bounds on decompressed data held at once, so a small gzip bomb cannot exhaust memory
+MAX_LINE_BYTES = 32 * 1024 * 1024
+_DECOMPRESS_CHUNK = 1 << 20
+
+IMPORTED_ROWS = registry.counter(
+    "edviz_import_rows_total",
+    "Graphs processed by the bulk importer",
+    ("outcome",),
+)
+
+NumberedLine = Tuple[int, bytes]
+
+
+class GraphRecord(BaseModel):
+    """One NDJSON line; ids and timestamps are generated when missing"""
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    title: str = Field(min_length=1)
+    summary_text: Optional[str] = None
+    graph_data: Dict[str, Any] = Field(default_factory=dict)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = Field(default=1, ge=1)
+
+    @field_validator("graph_data")
+    @classmethod
+    def check_graph_data(cls, value: Dict[str, Any]) -> Dict[str, Any]:
+        for key in ("nodes", "links"):
+            items = value.get(key)
+            if items is not None and not (isinstance(items, list) and all(isinstance(i, dict) for i in items)):
+                raise ValueError(f"graph_data.{key} must be a list of objects")
+        return value
+
+
+@dataclass
+class BatchReport:
+    batch: int
+    first_line: int
+    last_line: int
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    failed: Optional[str] = None  # Set when the whole batch was rolled back
+
+    def add_error(self, line: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+
+@dataclass
+class ImportReport:
+    batches: List[BatchReport] = field(default_factory=list)
+    # Set when the body could not be decoded to the end; batches before it are still reported
+    stream_error: Optional[str] = None
+
+    def totals(self) -> Dict[str, int]:
+        totals = {"received": 0, "inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0, "failed_batches": 0}
+        for batch in self.batches:
+            for key in ("received", "inserted", "updated", "unchanged", "invalid"):
+                totals[key] += getattr(batch, key)
+            totals["failed_batches"] += batch.failed is not None
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "totals": self.totals(),
+            "stream_error": self.stream_error,
+            "batches": [asdict(batch) for batch in self.batches],
+        }
+
+
+class LineDecoder:
+    """
+    Incrementally splits a byte stream into numbered lines.
+    Gzip input is detected from its magic bytes and decompressed on the fly,
+    at most _DECOMPRESS_CHUNK bytes at a time.
+    """
+
+    def __init__(self):
+        self._decompressor = None
+        self._detected = False
+        self._pending = b""
+        self._line_number = 0
+
+    def _split(self, data: bytes) -> List[NumberedLine]:
+        *lines, self._pending = (self._pending + data).split(b"\n")
+        return self._number(lines)
+
+    def _check_pending(self) -> None:
+        if len(self._pending) > MAX_LINE_BYTES:
+            raise ValueError(f"Line {self._line_number + 1} is longer than {MAX_LINE_BYTES} bytes")
+
+    @property
+    def line_number(self) -> int:
+        """Number of the last complete line returned so far"""
+        return self._line_number
+
+    def _number(self, lines: List[bytes]) -> List[NumberedLine]:
+        numbered = []
+        for line in lines:
+            self._line_number += 1
+            if line.strip():
+                numbered.append((self._line_number, line))
+        return numbered
+
+    def feed(self, chunk: bytes) -> Iterator[NumberedLine]:
+        if not self._detected:
+            if len(self._pending) + len(chunk) < 2:
+                self._pending += chunk
+                return
+            chunk, self._pending = self._pending + chunk, b""
+            self._detected = True
+            if chunk[:2] == b"\x1f\x8b":
+                self._decompressor = zlib.decompressobj(wbits=31)
+        if self._decompressor is None:
+            yield from self._split(chunk)
+            self._check_pending()
+            return
+        while chunk:
+            yield from self._split(self._decompressor.decompress(chunk, _DECOMPRESS_CHUNK))
+            self._check_pending()
+            chunk = self._decompressor.unconsumed_tail
+
+    def close(self) -> List[NumberedLine]:
+        lines = []
+        if not self._detected:
+            lines = self._split(b"")
+        elif self._decompressor is not None:
+            if not self._decompressor.eof:
+                raise ValueError("Truncated gzip stream")
+            lines = self._split(self._decompressor.flush())
+        return lines + self._number([self._pending])
+
+
+class GraphImporter:
+    """Validates NDJSON lines and upserts them into the graphs table in batches"""
+
+    def __init__(self, batch_size: Optional[int] = None):
+        batch_size = batch_size or config.get_int("IMPORT_BATCH_SIZE", 1000)
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"Batch size must be between 1 and {MAX_BATCH_SIZE}")
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _upsert_statement(rows: List[dict]):
+        table = Graph.__table__
+        statement = insert(table).values(rows)
+        excluded = statement.excluded
+        data_columns = ("title", "summary_text", "graph_data")
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                "title": excluded.title,
+                "summary_text": excluded.summary_text,
+                "graph_data": excluded.graph_data,
+                "version": table.c.version + 1,
+            },
+            # Identical rows are left alone so re-running an import does not bump versions
+            where=tuple_(*(table.c[name] for name in data_columns)).is_distinct_from(
+                tuple_(*(excluded[name] for name in data_columns))
+            ),
+        ).returning(table.c.id, literal_column("xmax = 0").label("inserted"))
+
+    def import_batch(self, db: Session, batch_number: int, lines: List[NumberedLine]) -> BatchReport:
+        """Validate and upsert one batch in a single transaction"""
+        report = BatchReport(batch=batch_number, first_line=lines[0][0], last_line=lines[-1][0], received=len(lines))
+
+        rows: Dict[uuid.UUID, dict] = {}
+        for line_number, line in lines:
+            try:
+                record = GraphRecord.model_validate_json(line)
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(str(part) for part in error["loc"])
+                report.add_error(line_number, f"{location}: {error['msg']}" if location else error["msg"])
+                continue
+            if record.id in rows:
+                # A row cannot be upserted twice in one statement; the later line wins
+                report.add_error(rows[record.id]["line"], f"Duplicate id {record.id} (superseded by line {line_number})")
+            rows[record.id] = {"line": line_number, **record.model_dump()}
+
+        if rows:
+            values = [{key: value for key, value in row.items() if key != "line"} for row in rows.values()]
+            try:
+                result = db.execute(self._upsert_statement(values)).all()
+                refresh_graph_concepts(db, [row.id for row in result])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error("Import batch %d (lines %d-%d) failed: %s",
+                             batch_number, report.first_line, report.last_line, e)
+                report.failed = str(e).splitlines()[0]
+                IMPORTED_ROWS.inc(len(values), outcome="failed")
+            else:
+                report.inserted = sum(1 for row in result if row.inserted)
+                report.updated = len(result) - report.inserted
+                report.unchanged = len(values) - len(result)
+                IMPORTED_ROWS.inc(report.inserted, outcome="inserted")
+                IMPORTED_ROWS.inc(report.updated, outcome="updated")
+                IMPORTED_ROWS.inc(report.unchanged, outcome="unchanged")
+
+        IMPORTED_ROWS.inc(report.invalid, outcome="invalid")
+        return report
+
+    def _next_batches(self, pending: List[NumberedLine], final: bool = False) -> Iterator[List[NumberedLine]]:
+        """Pop full batches off `pending` (and the remainder once the input is exhausted)"""
+        while len(pending) >= self.batch_size or (final and pending):
+            yield pending[:self.batch_size]
+            del pending[:self.batch_size]
+
+    @staticmethod
+    def _decode(report: ImportReport, decoder: LineDecoder, chunk: Optional[bytes]) -> Iterator[NumberedLine]:
+        """
+        Lines decoded from a chunk (or the end of the input when chunk is None).
+        A corrupt or truncated body ends the import: the error is recorded in
+        the report and the lines decoded before it are still imported.
+        """
+        try:
+            yield from decoder.close() if chunk is None else decoder.feed(chunk)
+        except (ValueError, zlib.error) as e:
+            logger.warning("Import stream error after line %d: %s", decoder.line_number, e)
+            report.stream_error = str(e)
+
+    def import_chunks(self, db: Session, chunks: Iterable[bytes]) -> ImportReport:
+        """Import a stream of raw (NDJSON or gzip) byte chunks"""
+        decoder = LineDecoder()
+        report = ImportReport()
+        pending: List[NumberedLine] = []
+        for chunk in chunks:
+            for line in self._decode(report, decoder, chunk):
+                pending.append(line)
+                for batch in self._next_batches(pending):
+                    report.batches.append(self.import_batch(db, len(report.batches) + 1, batch))
+            if report.stream_error:
+                break
+        else:
+            pending.extend(self._decode(report, decoder, None))
+        for batch in self._next_batches(pending, final=True):
+            report.batches.append(self.import_batch(db, len(report.batches) + 1, batch))
+        return report
+
+    async def import_async_chunks(self, db: Session, chunks: AsyncIterable[bytes]) -> ImportReport:
+        """
+        Like import_chunks for an async body stream. Batches run one at a time
+        in a worker thread so the event loop keeps serving other requests.
+        """
+        decoder = LineDecoder()
+        report = ImportReport()
+        pending: List[NumberedLine] = []
+        async for chunk in chunks:
+            for line in self._decode(report, decoder, chunk):
+                pending.append(line)
+                for batch in self._next_batches(pending):
+                    report.batches.append(
+                        await asyncio.to_thread(self.import_batch, db, len(report.batches) + 1, batch)
+                    )
+            if report.stream_error:
+                break
+        else:
+            pending.extend(self._decode(report, decoder, None))
+        for batch in self._next_batches(pending, final=True):
+            report.batches.append(await asyncio.to_thread(self.import_batch, db, len(report.batches) + 1, batch))
+        return report
+
+
+def _read_chunks(stream, size: int = 1 << 16) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import graphs from NDJSON")
+    parser.add_argument("input", nargs="?", help="NDJSON or NDJSON.gz file (defaults to stdin)")
+    parser.add_argument("--batch-size", type=int, help="Graphs per transaction (default IMPORT_BATCH_SIZE or 1000)")
+    args = parser.parse_args()
+
+    importer = GraphImporter(args.batch_size)
+    source = open(args.input, "rb") if args.input else sys.stdin.buffer
+    try:
+        with Session(get_engine()) as session:
+            report = importer.import_chunks(session, _read_chunks(source))
+    finally:
+        if args.input:
+            source.close()
+
+    for batch in report.batches:
+        if batch.failed or batch.invalid:
+            print(json.dumps(asdict(batch)), file=sys.stderr)
+    if report.stream_error:
+        print(json.dumps({"stream_error": report.stream_error}), file=sys.stderr)
+    totals = report.totals()
+    print(json.dumps(totals))
+    sys.exit(1 if totals["failed_batches"] or totals["invalid"] or report.stream_error else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Server-side JSON Patch (RFC 6902) support for stored graphs.
+
+Each operation is compiled into a small UPDATE that rewrites graph_data in
+place with jsonb_set / jsonb_insert / #-, so only the changed fragments
+travel over the wire. Optimistic concurrency is enforced with the graph's
+`version` column.
+"""
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlmodel import Session, text
+
+from related_graphs import refresh_graph_concepts
+
+MAX_PATCH_OPERATIONS = 200
+
+# Top-level graph fields that can be replaced directly
+SCALAR_FIELDS = {"title", "summary_text"}
+
+# Fields that change the Mermaid output; everything else (group, description, ...) does not
+LAYOUT_NODE_FIELDS = {"id", "name"}
+LAYOUT_LINK_FIELDS = {"source", "target", "type"}
+
+
+SUPPORTED_OPERATIONS = ("add", "remove", "replace", "test")
+
+
+class PatchOperation(BaseModel):
+    op: str  # Checked in compile_operation so unsupported ops (move, copy) are reported as 400
+    path: str
+    value: Optional[Any] = None
+
+
+class PatchError(ValueError):
+    """Raised for patches that are malformed or target unsupported paths"""
+
+
+class VersionConflictError(Exception):
+    """Raised when the stored version does not match the expected one"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Graph was modified (current version {current_version})")
+        self.current_version = current_version
+
+
+class PatchTestFailedError(Exception):
+    """Raised when a `test` operation does not match the stored document"""
+
+
+class PatchTargetMissingError(Exception):
+    """Raised when the target (replace/remove) or its parent (add) does not exist"""
+
+
+@dataclass
+class PatchResult:
+    version: int
+    layout_changed: bool
+    graph_data: Optional[dict] = None
+
+
+def parse_pointer(path: str) -> List[str]:
+    """Split an RFC 6901 JSON pointer into unescaped reference tokens"""
+    if not path.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: '{path}'")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _affects_layout(tokens: List[str]) -> bool:
+    """Whether changing graph_data at `tokens` can change the rendered Mermaid graph"""
+    if not tokens or tokens == [""]:
+        return True
+    collection = tokens[0]
+    if collection not in ("nodes", "links"):
+        return False
+    if len(tokens) <= 2:
+        # Whole array or a whole element was added, removed or replaced
+        return True
+    fields = LAYOUT_NODE_FIELDS if collection == "nodes" else LAYOUT_LINK_FIELDS
+    return tokens[2] in fields
+
+
+def compile_operation(operation: PatchOperation) -> Tuple[str, str, dict, bool, Optional[str]]:
+    """
+    Compile one patch operation into SQL evaluated against the current row.
+    Returns (kind, sql, params, layout_changed, guard) where kind is "set" for
+    an assignment expression and "test" for a boolean condition. guard is a
+    condition the target location must meet (RFC 6902 4.1-4.3: the target of
+    replace/remove and the parent of add must exist), or None.
+    """
+    if operation.op not in SUPPORTED_OPERATIONS:
+        raise PatchError(f"Unsupported patch operation '{operation.op}'")
+    tokens = parse_pointer(operation.path)
+    has_value = "value" in operation.model_fields_set
+
+    if tokens[0] in SCALAR_FIELDS and len(tokens) == 1:
+        if operation.op == "test":
+            return "test", f"{tokens[0]} IS NOT DISTINCT FROM :value", {"value": operation.value}, False, None
+        if operation.op != "replace" or not isinstance(operation.value, str):
+            raise PatchError(f"'{operation.path}' only supports 'replace' with a string value")
+        return "set", f"{tokens[0]} = :value", {"value": operation.value}, False, None
+
+    if tokens[0] != "graph_data":
+        raise PatchError(f"Unsupported patch path: '{operation.path}'")
+
+    sub_path = tokens[1:]
+    if operation.op in ("add", "replace", "test") and not has_value:
+        raise PatchError(f"'{operation.op}' operation on '{operation.path}' requires a value")
+    if operation.op == "remove" and not sub_path:
+        raise PatchError("Cannot remove the whole graph_data document")
+
+    params: dict = {"path": sub_path}
+    if has_value:
+        params["value"] = json.dumps(operation.value)
+
+    if operation.op == "test":
+        return "test", "graph_data #> CAST(:path AS text[]) = CAST(:value AS jsonb)", params, False, None
+
+    guard = None
+    if operation.op == "add" and sub_path:
+        params["parent"] = sub_path[:-1]
+    parent_type = "jsonb_typeof(graph_data #> CAST(:parent AS text[]))"
+    if not sub_path:
+        # Replacing the whole document
+        expr = "CAST(:value AS jsonb)"
+    elif operation.op in ("replace", "remove"):
+        guard = "graph_data #> CAST(:path AS text[]) IS NOT NULL"
+        if operation.op == "remove":
+            expr = "graph_data #- CAST(:path AS text[])"
+        else:
+            expr = "jsonb_set(graph_data, CAST(:path AS text[]), CAST(:value AS jsonb), false)"
+    elif sub_path[-1] == "-":
+        # Append to the end of an existing array
+        guard = f"{parent_type} = 'array'"
+        expr = (
+            "jsonb_set(graph_data, CAST(:parent AS text[]), "
+            "(graph_data #> CAST(:parent AS text[])) || jsonb_build_array(CAST(:value AS jsonb)))"
+        )
+    elif sub_path[-1].isdigit():
+        # Insert before an array index (at most the array length), or set a numeric object key
+        params["index"] = int(sub_path[-1])
+        guard = (
+            f"CASE {parent_type} WHEN 'object' THEN true "
+            "WHEN 'array' THEN :index <= jsonb_array_length(graph_data #> CAST(:parent AS text[])) "
+            "ELSE false END"
+        )
+        expr = (
+            f"CASE WHEN {parent_type} = 'array' "
+            "THEN jsonb_insert(graph_data, CAST(:path AS text[]), CAST(:value AS jsonb)) "
+            "ELSE jsonb_set(graph_data, CAST(:path AS text[]), CAST(:value AS jsonb), true) END"
+        )
+    else:
+        # Add or replace an object member
+        guard = f"{parent_type} = 'object'"
+        expr = "jsonb_set(graph_data, CAST(:path AS text[]), CAST(:value AS jsonb), true)"
+
+    return "set", f"graph_data = {expr}", params, _affects_layout(sub_path), guard
+
+
+def apply_graph_patch(
+    db: Session,
+    graph_id: uuid.UUID,
+    operations: List[PatchOperation],
+    expected_version: Optional[int] = None,
+    return_graph_data: bool = False,
+) -> Optional[PatchResult]:
+    """
+    Apply a JSON Patch to a stored graph in a single transaction.
+
+    The row is locked, each operation runs as a small in-place UPDATE (or a
+    check for `test`), and the version is bumped at the end. graph_data is
+    only read back when requested and the patch changed layout-relevant
+    fields. Returns None if the graph does not exist.
+    """
+    if not operations:
+        raise PatchError("Patch must contain at least one operation")
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise PatchError(f"Patch must not contain more than {MAX_PATCH_OPERATIONS} operations")
+
+    # Validate everything before touching the database
+    compiled = [compile_operation(operation) for operation in operations]
+    layout_changed = any(changed for _, _, _, changed, _ in compiled)
+
+    try:
+        current = db.execute(
+            text("SELECT version FROM graphs WHERE id = :id FOR UPDATE"), {"id": graph_id}
+        ).first()
+        if current is None:
+            db.rollback()
+            return None
+        if expected_version is not None and current.version != expected_version:
+            db.rollback()
+            raise VersionConflictError(current.version)
+
+        for operation, (kind, sql, params, _, guard) in zip(operations, compiled):
+            params = {**params, "id": graph_id}
+            if kind == "test":
+                if not db.execute(text(f"SELECT {sql} AS ok FROM graphs WHERE id = :id"), params).scalar():
+                    db.rollback()
+                    raise PatchTestFailedError("Patch 'test' operation failed")
+                continue
+            condition = f" AND ({guard})" if guard else ""
+            updated = db.execute(text(f"UPDATE graphs SET {sql} WHERE id = :id{condition}"), params)
+            if updated.rowcount == 0:
+                db.rollback()
+                raise PatchTargetMissingError(f"Patch target '{operation.path}' does not exist")
+
+        if layout_changed:
+            # Node names may have changed; keep the related-graphs index in the same transaction
+            refresh_graph_concepts(db, [graph_id])
+
+        returning = "version, graph_data" if return_graph_data and layout_changed else "version"
+        row = db.execute(
+            text(f"UPDATE graphs SET version = version + 1 WHERE id = :id RETURNING {returning}"),
+            {"id": graph_id},
+        ).first()
+        db.commit()
+    except (VersionConflictError, PatchTestFailedError, PatchTargetMissingError):
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+    return PatchResult(
+        version=row.version,
+        layout_changed=layout_changed,
+        graph_data=row.graph_data if return_graph_data and layout_changed else None,
+    )
@@ -0,0 +1,118 @@
+import atexit
+import io
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Optional
+
+from config import config
+from metrics import registry
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_RECORDS_DROPPED = registry.counter(
+    "edviz_log_records_dropped_total",
+    "Number of log records dropped because the logging queue was full",
+)
+
+_listener: Optional[QueueListener] = None
+_console_stream: Optional[io.TextIOWrapper] = None
+_payload_limit = 500
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records never leave the process, so message formatting is deferred
+        # to the listener thread instead of running on the request thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogPreview:
+    """Lazily rendered, size-bounded representation of a log payload.
+
+    The wrapped value is only converted to a string when a handler actually
+    formats the record, so disabled log levels cost nothing.
+    """
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = limit if limit is not None else _payload_limit
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... [truncated {len(text) - self.limit} of {len(text)} chars]"
+
+    __repr__ = __str__
+
+
+def log_preview(value: Any, limit: Optional[int] = None) -> LogPreview:
+    """Wrap a potentially large payload for lazy, truncated logging"""
+    return LogPreview(value, limit)
+
+
+def setup_logging(log_file: Path = config.log_file) -> QueueListener:
+    """Route all logging through a bounded queue drained by a background thread.
+
+    The request thread only enqueues records; the listener thread writes them
+    to the console and to a size-capped, rotating log file.
+    """
+    global _listener, _console_stream, _payload_limit
+    if _listener is not None:
+        return _listener
+
+    level = logging.DEBUG if config.get_env_var("LOG_LEVEL") == "DEBUG" else logging.INFO
+    _payload_limit = config.get_int("LOG_PAYLOAD_LIMIT", 500)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    # Rotate the log file so it can never grow past max_bytes * (backup_count + 1)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=config.get_int("LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backupCount=config.get_int("LOG_BACKUP_COUNT", 5),
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+
+    # Console handler that forces UTF-8 encoding for console output.
+    # The wrapper is kept for the life of the process: closing it would close stderr.
+    if _console_stream is None:
+        _console_stream = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+    console_handler = logging.StreamHandler(_console_stream)
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=config.get_int("LOG_QUEUE_SIZE", 10000))
+    queue_handler = DroppingQueueHandler(log_queue)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background logging thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
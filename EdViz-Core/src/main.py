@@ -1,60 +1,100 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends, Query, Form, status
+import time
+
+# Measured against STARTUP_BUDGET_SECONDS once the app has started
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends, Query, Form, Header, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import Dict, Any, Optional
 import logging
 from pathlib import Path
-import os
-from dotenv import load_dotenv
 import uuid
-import sys
-import io
 from typing import List, Optional
 from sqlmodel import Session, select, text
 import re
 
-from pdf_processor import PDFProcessor
-from ai_processor import AIProcessor
-from graph_generator import GraphGenerator
-
-from database import get_session
+from config import config
+from database import get_session, dispose_engine
 from models import Graph
 from datetime import datetime
 from open_in_new_tab import router as open_in_new_tab_router
 
-from email_service import EmailService
-
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
-
-# Create a StreamHandler that forces UTF-8 encoding for console output
-# Ensure this is defined before basicConfig if it's used there.
-# For safety, let's define it globally or right before basicConfig.
-# We will create it inside the basicConfig call for simplicity now,
-# but a more structured approach might define handlers separately.
-
-# Configure logging
-# Prepare console handler with UTF-8
-console_stream = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-console_handler = logging.StreamHandler(console_stream)
-
-logging.basicConfig(
-    level=logging.DEBUG if os.getenv("LOG_LEVEL") == "DEBUG" else logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log', encoding='utf-8'),
-        console_handler # Use the UTF-8 console handler
-    ]
+from email_service import EmailNotConfiguredError, OutboxFullError
+from admission import admit, admission_slot, admission_stats
+from rendering import graph_view, render_svg_content, render_svg_digest
+from graph_export import stream_export
+from graph_import import GraphImporter
+from related_graphs import find_related_graphs, refresh_graph_concepts
+from graph_patch import (
+    PatchOperation, PatchError, VersionConflictError, PatchTestFailedError, PatchTargetMissingError, apply_graph_patch
+)
+from metrics import registry, stage_timer, PROMETHEUS_CONTENT_TYPE, CACHE_HITS, CACHE_MISSES
+from logging_config import setup_logging, shutdown_logging, log_preview
+from services import (
+    get_pdf_processor,
+    get_ai_processor,
+    get_near_duplicate_index,
+    get_artifact_store,
+    get_email_outbox,
+    warm_up,
 )
+
 logger = logging.getLogger(__name__)
 
+_import_seconds = time.perf_counter() - _import_started
+
+STARTUP_SECONDS = registry.gauge(
+    "edviz_startup_seconds",
+    "Time spent in each application startup phase",
+    ("phase",),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    startup_started = time.perf_counter()
+
+    # Configure logging (queue-based, rotating, written from a background thread)
+    setup_logging(Path(config.get_env_var("LOG_FILE", str(config.log_file))))
+    config.ensure_directories()
+
+    await get_email_outbox().start()
+    await get_artifact_store().start()
+
+    if config.get_bool("WARMUP_ON_STARTUP", False):
+        warmup_started = time.perf_counter()
+        await asyncio.to_thread(warm_up)
+        STARTUP_SECONDS.set(time.perf_counter() - warmup_started, phase="warmup")
+
+    startup_seconds = time.perf_counter() - startup_started
+    STARTUP_SECONDS.set(_import_seconds, phase="import")
+    STARTUP_SECONDS.set(startup_seconds, phase="startup")
+    total = _import_seconds + startup_seconds
+    budget = config.get_float("STARTUP_BUDGET_SECONDS", 2.0)
+    if total > budget:
+        logger.warning("Startup took %.3fs (import %.3fs), over the %.1fs budget", total, _import_seconds, budget)
+    else:
+        logger.info("Startup took %.3fs (import %.3fs)", total, _import_seconds)
+
+    yield
+
+    await get_artifact_store().stop()
+    await get_email_outbox().stop()
+    dispose_engine()
+    shutdown_logging()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Graph Management API",
     description="API for managing graph data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -69,20 +109,6 @@ app.add_middleware(
 # Include routers
 app.include_router(open_in_new_tab_router)
 
-# Create necessary directories
-UPLOAD_DIR = Path("uploads")
-OUTPUT_DIR = Path("output")
-UPLOAD_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
-
-# Initialize processors
-pdf_processor = PDFProcessor()
-ai_processor = AIProcessor()
-graph_generator = GraphGenerator()
-
-# Initialize email service
-email_service = EmailService()
-
 # Contact form request model
 class ContactRequest(BaseModel):
     name: str
@@ -92,16 +118,30 @@ class ContactRequest(BaseModel):
 
 class RenderGraphRequest(BaseModel):
     graph_json: Dict[str, Any]
+    detail: str = "auto"  # "auto", "full" or "clusters"
+    expand: List[str] = []  # Cluster ids to show in full when clustered
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "admission": admission_stats(),
+        "email_outbox": get_email_outbox().stats()
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Expose processing metrics in the Prometheus text format"""
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.post("/graphs")
 def create_graph(graph: Graph, db: Session = Depends(get_session)):
     """Create a new graph"""
     db.add(graph)
+    db.flush()
+    refresh_graph_concepts(db, [graph.id])
     db.commit()
     db.refresh(graph)
     return graph
@@ -122,7 +162,7 @@ def search_graphs(
     q: str = Query(..., min_length=1, description="Search query"),
     db: Session = Depends(get_session)
 ):
-    logger.info(f"[search_graphs] Raw query param: q='{q}'")
+    logger.info("[search_graphs] Raw query param: q='%s'", log_preview(q, 200))
     if not q.strip():
         raise HTTPException(status_code=400, detail="Search query cannot be empty.")
 
@@ -135,15 +175,46 @@ def search_graphs(
             SELECT * FROM search_graphs(:query)
         """)
 
-        logger.info(f"[search_graphs] Executing DB search with query: '{sanitized_query}'")
-        result = db.execute(search_query, {"query": sanitized_query})
-        rows = result.fetchall()
-        logger.info(f"[search_graphs] Raw DB rows: {rows}")
+        logger.info("[search_graphs] Executing DB search with query: '%s'", log_preview(sanitized_query, 200))
+        with stage_timer("search_graphs", "db_search"):
+            result = db.execute(search_query, {"query": sanitized_query})
+            rows = result.fetchall()
+        logger.debug("[search_graphs] DB search returned %d rows", len(rows))
         return [Graph.model_validate(row._mapping) for row in rows]
     except Exception as e:
-        logger.error(f"[search_graphs] Database error during search: {str(e)}", exc_info=True)
+        logger.error("[search_graphs] Database error during search: %s", e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error during search.")
 
+@app.get("/graphs/export")
+def export_graphs(
+    format: str = Query("ndjson", pattern="^(ndjson|ndjson.gz)$", description="ndjson or ndjson.gz"),
+    since: Optional[datetime] = Query(None, description="Only graphs created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only graphs created before this time")
+):
+    """Stream all graphs (optionally within a date range) as NDJSON, oldest first"""
+    compress = format == "ndjson.gz"
+    filename = f"graphs.{format}"
+    return StreamingResponse(
+        stream_export(since, until, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/graphs/import")
+async def import_graphs(request: Request, db: Session = Depends(get_session)):
+    """
+    Bulk upsert graphs from an NDJSON request body (optionally gzip-compressed).
+    Lines are validated and written in batches, one transaction per batch;
+    returns totals plus a per-batch report of invalid lines and failed batches.
+    A corrupt or truncated body is reported in `stream_error` together with
+    the batches committed before it.
+    """
+    with stage_timer("import_graphs", "db_upsert"):
+        report = await GraphImporter().import_async_chunks(db, request.stream())
+
+    totals = report.totals()
+    logger.info("Imported graphs: %s", totals)
+    return report.to_dict()
 
 @app.get("/graphs/{graph_id}", response_model=Graph)
 def read_graph(graph_id: uuid.UUID, db: Session = Depends(get_session)):
@@ -154,13 +225,121 @@ def read_graph(graph_id: uuid.UUID, db: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Graph not found")
     return graph
 
-@app.post("/upload-pdf")
+@app.get("/graphs/{graph_id}/related")
+def related_graphs(
+    graph_id: uuid.UUID,
+    limit: int = Query(10, ge=1, le=100),
+    method: str = Query("jaccard", pattern="^(jaccard|idf)$", description="jaccard or idf-weighted overlap"),
+    db: Session = Depends(get_session)
+):
+    """Graphs that share the most concepts (normalized node names) with the given graph"""
+    with stage_timer("related_graphs", "db_lookup"):
+        related = find_related_graphs(
+            db, graph_id, limit, method,
+            max_document_frequency=config.get_int("RELATED_MAX_DOCUMENT_FREQUENCY", 5000)
+        )
+    if related is None:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    return [
+        {"id": str(item.graph_id), "title": item.title, "shared_concepts": item.shared_concepts, "score": item.score}
+        for item in related
+    ]
+
+@app.get("/graphs/{graph_id}/render", dependencies=[Depends(admit("render"))])
+async def render_stored_graph(
+    graph_id: uuid.UUID,
+    detail: str = Query("auto", pattern="^(auto|full|clusters)$", description="auto, full or clusters"),
+    expand: List[str] = Query([], description="Cluster ids to show in full"),
+    db: Session = Depends(get_session)
+):
+    """
+    Render a stored graph at the requested level of detail.
+    Start with the cluster overview and expand clusters on demand.
+    """
+    graph = await asyncio.to_thread(db.get, Graph, graph_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Graph not found")
+
+    view = graph_view(graph.graph_data, detail, expand)
+    svg_content = await render_svg_content(view.graph, "render_stored_graph")
+    return {"id": str(graph_id), "svg_content": svg_content, "detail": view.detail, "clusters": view.clusters}
+
+@app.patch("/graphs/{graph_id}")
+async def patch_graph(
+    graph_id: uuid.UUID,
+    operations: List[PatchOperation],
+    response: Response,
+    request: Request,
+    render: bool = Query(False, description="Return a re-rendered SVG if the layout changed"),
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session)
+):
+    """
+    Apply a JSON Patch (RFC 6902) to a graph in place.
+    Paths address the graph resource, e.g. /graph_data/nodes/3/name or /title.
+    Send the graph version in If-Match to reject concurrent edits.
+    """
+    expected_version = None
+    # "*" matches any existing version
+    if if_match and if_match.strip() != "*":
+        try:
+            expected_version = int(if_match.strip().removeprefix("W/").strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="If-Match must contain the graph version")
+
+    try:
+        with stage_timer("patch_graph", "db_update"):
+            result = await asyncio.to_thread(apply_graph_patch, db, graph_id, operations, expected_version, render)
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e), headers={"ETag": f'"{e.current_version}"'})
+    except (PatchTestFailedError, PatchTargetMissingError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Error patching graph %s: %s", graph_id, e)
+        raise HTTPException(status_code=500, detail="Database error while updating graph.")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Graph not found")
+
+    response.headers["ETag"] = f'"{result.version}"'
+    body: Dict[str, Any] = {
+        "id": str(graph_id),
+        "version": result.version,
+        "rerendered": False
+    }
+
+    # Only layout-relevant edits (node ids/names, link endpoints/types) need a new SVG.
+    # The patch is already committed, so a refused or failed render is reported in
+    # the body instead of turning the response into an error.
+    if render and result.layout_changed:
+        try:
+            async with admission_slot("render", request):
+                view = graph_view(result.graph_data)
+                body["svg_content"] = await render_svg_content(view.graph, "patch_graph")
+        except HTTPException as e:
+            logger.warning("Graph %s patched but not re-rendered: %s", graph_id, e.detail)
+            body["render_error"] = e.detail
+        except Exception as e:
+            logger.error("Error re-rendering patched graph %s: %s", graph_id, e)
+            body["render_error"] = "Failed to render graph"
+        else:
+            body["rerendered"] = True
+            body["detail"] = view.detail
+            body["clusters"] = view.clusters
+
+    return body
+
+@app.post("/upload-pdf", dependencies=[Depends(admit("upload"))])
 async def upload_pdf(
     file: UploadFile = File(...), db: Session = Depends(get_session),
-    graph_type: str = Form("mermaid")  # Default to mermaid if not specified
+    graph_type: str = Form("mermaid"),  # Default to mermaid if not specified
+    duplicate_mode: Optional[str] = Form(None)  # "auto", "offer" or "off"; defaults to DEDUP_MODE
 ):
     """
-    Upload and process a PDF file
+    Upload and process a PDF file.
+    Near-identical documents that were already processed can reuse the existing graph.
     """
     try:
         if not file.filename.endswith('.pdf'):
@@ -168,134 +347,197 @@ async def upload_pdf(
         
         if graph_type not in ["mermaid", "force"]:
             raise HTTPException(status_code=400, detail="graph_type must be either 'mermaid' or 'force'")
+
+        duplicate_mode = duplicate_mode or config.get_env_var("DEDUP_MODE", "auto")
+        if duplicate_mode not in ["auto", "offer", "off"]:
+            raise HTTPException(status_code=400, detail="duplicate_mode must be 'auto', 'offer' or 'off'")
         
+        pdf_processor = get_pdf_processor()
+        ai_processor = get_ai_processor()
+
         # Generate unique filename
         unique_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"{unique_id}.pdf"
+        store = get_artifact_store()
         
-        # Save the uploaded file
-        with open(file_path, "wb") as buffer:
+        # Save the uploaded file (identical PDFs are stored once)
+        with stage_timer("upload_pdf", "save_upload"):
             content = await file.read()
-            buffer.write(content)
+            pdf_digest = await asyncio.to_thread(store.put_bytes, content)
+            store.link(f"pdf/{unique_id}", pdf_digest)
+            file_path = store.path(pdf_digest)
         
-        logger.info(f"Successfully uploaded file: {file.filename}")
+        logger.info("Successfully uploaded file: %s", file.filename)
         
         # Process PDF
-        pdf_data = pdf_processor.process_pdf(file_path)
-        logger.debug(f"PDF data: {pdf_data}")
-        
-        # Generate comprehensive text
-        logger.debug(f"Generating comprehensive text")
-        comprehensive_text = await ai_processor.generate_comprehensive_text(pdf_data["text"])
-        logger.debug(f"Comprehensive text: {comprehensive_text}")
-        
-        # Generate graph JSON
-        graph_json = await ai_processor.generate_graph_json(comprehensive_text)
-        logger.debug(f"Graph JSON: {graph_json}")
-        
-        new_graph = Graph(
-            title=Path(file.filename).stem,  # Always use PDF filename without extension as title
-            summary_text=comprehensive_text,
-            graph_data=graph_json,
-            created_at=datetime.utcnow()
-        )
-        db.add(new_graph)
-        db.commit()
-        db.refresh(new_graph)
-
-        response = {
-            "message": "File processed successfully",
-            "graph_id": str(new_graph.id),
-            "graph_json": graph_json
-        }
+        with stage_timer("upload_pdf", "pdf_extract"):
+            pdf_data = await asyncio.to_thread(pdf_processor.process_pdf, file_path)
+        logger.debug("PDF data: %s", log_preview(pdf_data))
+
+        # Look for a near-identical document that already has a graph
+        dedup_index = get_near_duplicate_index()
+        duplicate, existing_graph = None, None
+        with stage_timer("upload_pdf", "near_duplicate_lookup"):
+            signature = await asyncio.to_thread(dedup_index.signature, pdf_data["text"])
+            if signature and duplicate_mode != "off":
+                duplicate, existing_graph = await asyncio.to_thread(dedup_index.find_graph, db, signature)
+
+        if existing_graph is not None:
+            CACHE_HITS.inc(cache="near_duplicate")
+            logger.info("Upload %s is a near-duplicate (%.2f) of graph %s",
+                        file.filename, duplicate.similarity, existing_graph.id)
+            if duplicate_mode == "offer":
+                return {
+                    "message": "A near-identical document was already processed",
+                    "duplicate_of": {
+                        "graph_id": str(existing_graph.id),
+                        "title": existing_graph.title,
+                        "similarity": duplicate.similarity
+                    }
+                }
+            graph_json = existing_graph.graph_data
+            response = {
+                "message": "Reused the graph of a near-identical document",
+                "graph_id": str(existing_graph.id),
+                "graph_json": graph_json,
+                "reused": True,
+                "similarity": duplicate.similarity
+            }
+        else:
+            if duplicate_mode != "off":
+                CACHE_MISSES.inc(cache="near_duplicate")
+
+            if ai_processor.pipeline_mode == "single_call":
+                # Summary and graph from one structured-output request
+                with stage_timer("upload_pdf", "llm_summary_graph", ai_processor.provider):
+                    comprehensive_text, graph_json = await ai_processor.generate_summary_and_graph(pdf_data["text"])
+                logger.debug("Comprehensive text: %s", log_preview(comprehensive_text))
+            else:
+                # Generate comprehensive text
+                logger.debug("Generating comprehensive text")
+                with stage_timer("upload_pdf", "llm_summary", ai_processor.provider):
+                    comprehensive_text = await ai_processor.generate_comprehensive_text(pdf_data["text"])
+                logger.debug("Comprehensive text: %s", log_preview(comprehensive_text))
+
+                # Generate graph JSON
+                with stage_timer("upload_pdf", "llm_graph", ai_processor.provider):
+                    graph_json = await ai_processor.generate_graph_json(comprehensive_text)
+            logger.debug("Graph JSON: %s", log_preview(graph_json))
+
+            new_graph = Graph(
+                title=Path(file.filename).stem,  # Always use PDF filename without extension as title
+                summary_text=comprehensive_text,
+                graph_data=graph_json,
+                created_at=datetime.utcnow()
+            )
+            def save_graph():
+                db.add(new_graph)
+                if signature:
+                    dedup_index.add(db, new_graph.id, signature)
+                db.flush()
+                refresh_graph_concepts(db, [new_graph.id])
+                db.commit()
+                db.refresh(new_graph)
+
+            with stage_timer("upload_pdf", "db_insert"):
+                await asyncio.to_thread(save_graph)
+
+            response = {
+                "message": "File processed successfully",
+                "graph_id": str(new_graph.id),
+                "graph_json": graph_json
+            }
         
         # Generate SVG only for mermaid graph type
         if graph_type == "mermaid":
-            # Generate SVG
-            svg_path = graph_generator.generate_svg(graph_json, unique_id)
-            logger.debug(f"SVG path: {svg_path}")
-            
-            # Get the SVG file content
-            svg_path = Path(f"output/{unique_id}.svg")
-            if not svg_path.exists():
+            view = graph_view(graph_json)
+            svg_digest = await render_svg_digest(view.graph, "upload_pdf")
+            # Retrievable from any worker sharing the store via /get-svg/{file_id}
+            store.link(f"svg/{unique_id}", svg_digest)
+            svg_content = await asyncio.to_thread(store.get_bytes, svg_digest)
+            if svg_content is None:
                 raise HTTPException(status_code=404, detail="SVG file not found")
-                
-            with open(svg_path, "r") as f:
-                svg_content = f.read()
-                
-            response["svg_content"] = svg_content
+
+            response["svg_content"] = svg_content.decode("utf-8")
+            response["file_id"] = unique_id
+            response["detail"] = view.detail
+            response["clusters"] = view.clusters
             
         return response
     
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}")
+        logger.error("Error processing file: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/get-svg/{file_id}")
 async def get_svg(file_id: str):
     """Get the generated SVG file"""
     try:
-        svg_path = OUTPUT_DIR / f"{file_id}.svg"
-        if not svg_path.exists():
+        try:
+            svg_path = get_artifact_store().open_alias(f"svg/{file_id}")
+        except ValueError:
             raise HTTPException(status_code=404, detail="SVG file not found")
+        if svg_path is None:
+            # Files rendered before the artifact store was introduced
+            svg_path = config.output_dir / f"{file_id}.svg"
+            if not svg_path.exists():
+                raise HTTPException(status_code=404, detail="SVG file not found")
         return FileResponse(svg_path, media_type="image/svg+xml")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error retrieving SVG file: {str(e)}")
+        logger.error("Error retrieving SVG file: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/contact")
 async def contact_form(request: ContactRequest):
     """
-    Handle contact form submissions
+    Handle contact form submissions.
+    The message is queued and delivered in the background by the email outbox.
     """
     try:
-        success = email_service.send_contact_email(
+        get_email_outbox().enqueue(
             name=request.name,
             email=request.email,
             subject=request.subject,
             message=request.message
         )
-        
-        if success:
-            return {
-                "message": "Thank you for your message. We'll get back to you soon!",
-                "status": "success"
-            }
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to send message. Please try again later."
-            )
-            
+        return {
+            "message": "Thank you for your message. We'll get back to you soon!",
+            "status": "success"
+        }
+
+    except OutboxFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Failed to send message. Please try again later.",
+            headers={"Retry-After": "60"}
+        )
+    except EmailNotConfiguredError:
+        raise HTTPException(
+            status_code=503,
+            detail="The contact form is currently unavailable."
+        )
     except Exception as e:
-        logger.error(f"Error processing contact form: {str(e)}")
+        logger.error("Error processing contact form: %s", e)
         raise HTTPException(
             status_code=500,
             detail="An error occurred while processing your message."
         )
 
-@app.post("/render-graph")
+@app.post("/render-graph", dependencies=[Depends(admit("render"))])
 async def render_graph(request: RenderGraphRequest):
     """
-    Render a Mermaid SVG from a graph JSON structure
+    Render a Mermaid SVG from a graph JSON structure.
+    Large graphs are collapsed into clusters; pass cluster ids in `expand` to show them in full.
     """
     try:
-        # Generate a temporary unique filename (not saved for reuse)
-        temp_id = str(uuid.uuid4())
-        svg_path = graph_generator.generate_svg(request.graph_json, temp_id)
-        if not svg_path or not Path(svg_path).exists():
-            raise HTTPException(status_code=500, detail="Failed to generate SVG")
-        with open(svg_path, "r") as f:
-            svg_content = f.read()
-        # Optionally, clean up the temp files (SVG and .mmd)
-        try:
-            Path(svg_path).unlink(missing_ok=True)
-            Path(f"output/{temp_id}.mmd").unlink(missing_ok=True)
-        except Exception as cleanup_err:
-            logger.warning(f"Failed to clean up temp files: {cleanup_err}")
-        return {"svg_content": svg_content}
+        view = graph_view(request.graph_json, request.detail, request.expand)
+        svg_content = await render_svg_content(view.graph, "render_graph")
+        return {"svg_content": svg_content, "detail": view.detail, "clusters": view.clusters}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error rendering graph SVG: {str(e)}")
+        logger.error("Error rendering graph SVG: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
@@ -0,0 +1,2 @@
+-- Add a version column used for optimistic concurrency on PATCH /graphs/{graph_id}
+ALTER TABLE graphs ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,34 @@
+-- Inverted index from normalized node names (concepts) to graphs, used by GET /graphs/{graph_id}/related
+CREATE TABLE IF NOT EXISTS graph_concepts (
+    concept TEXT NOT NULL,
+    graph_id UUID NOT NULL REFERENCES graphs(id) ON DELETE CASCADE,
+    PRIMARY KEY (concept, graph_id)
+);
+
+-- Supports ON DELETE CASCADE from graphs and per-graph refreshes
+CREATE INDEX IF NOT EXISTS idx_graph_concepts_graph_id ON graph_concepts(graph_id);
+
+-- Number of distinct concepts per graph (denominator of the similarity scores)
+CREATE TABLE IF NOT EXISTS graph_concept_counts (
+    graph_id UUID PRIMARY KEY REFERENCES graphs(id) ON DELETE CASCADE,
+    concept_count INTEGER NOT NULL
+);
+
+-- Backfill existing graphs; the normalization must match related_graphs.py
+INSERT INTO graph_concepts (concept, graph_id)
+SELECT concepts.concept, g.id
+FROM graphs g CROSS JOIN LATERAL (
+    SELECT DISTINCT lower(btrim(regexp_replace(node->>'name', '\s+', ' ', 'g'))) AS concept
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(g.graph_data->'nodes') = 'array' THEN g.graph_data->'nodes' ELSE '[]'::jsonb END
+    ) AS node
+    WHERE jsonb_typeof(node->'name') = 'string'
+) AS concepts
+WHERE concepts.concept <> ''
+ON CONFLICT DO NOTHING;
+
+INSERT INTO graph_concept_counts (graph_id, concept_count)
+SELECT g.id, count(gc.concept)
+FROM graphs g LEFT JOIN graph_concepts gc ON gc.graph_id = g.id
+GROUP BY g.id
+ON CONFLICT (graph_id) DO UPDATE SET concept_count = EXCLUDED.concept_count;
@@ -0,0 +1,16 @@
+-- MinHash signatures of the text extracted from each uploaded PDF
+CREATE TABLE IF NOT EXISTS graph_signatures (
+    graph_id UUID PRIMARY KEY REFERENCES graphs(id) ON DELETE CASCADE,
+    signature BIGINT[] NOT NULL
+);
+
+-- LSH band buckets; a lookup only touches the rows sharing a bucket with the query
+CREATE TABLE IF NOT EXISTS graph_lsh_bands (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    graph_id UUID NOT NULL REFERENCES graphs(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, graph_id)
+);
+
+-- Supports ON DELETE CASCADE from graphs
+CREATE INDEX IF NOT EXISTS idx_graph_lsh_bands_graph_id ON graph_lsh_bands(graph_id);
@@ -1,9 +1,9 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, Text
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Text, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 
 class Graph(SQLModel, table=True):
     __tablename__ = "graphs"  # Explicitly set the table name to 'graphs'
@@ -14,3 +14,29 @@ class Graph(SQLModel, table=True):
     graph_data: Dict = Field(default={}, sa_column=Column(JSONB))
     created_at: datetime = Field(default_factory=datetime.utcnow)
     search_vector: Optional[str] = Field(default=None, sa_column=Column("search_vector", Text))
+    version: int = Field(default=1)  # Incremented on every update, used for optimistic concurrency
+
+class GraphSignature(SQLModel, table=True):
+    __tablename__ = "graph_signatures"
+
+    graph_id: uuid.UUID = Field(foreign_key="graphs.id", primary_key=True)
+    signature: List[int] = Field(sa_column=Column(ARRAY(BigInteger), nullable=False))
+
+class GraphLshBand(SQLModel, table=True):
+    __tablename__ = "graph_lsh_bands"
+
+    band: int = Field(primary_key=True)
+    bucket: int = Field(sa_column=Column(BigInteger, primary_key=True))
+    graph_id: uuid.UUID = Field(foreign_key="graphs.id", primary_key=True)
+
+class GraphConcept(SQLModel, table=True):
+    __tablename__ = "graph_concepts"
+
+    concept: str = Field(primary_key=True)  # Normalized node name
+    graph_id: uuid.UUID = Field(foreign_key="graphs.id", primary_key=True)
+
+class GraphConceptCount(SQLModel, table=True):
+    __tablename__ = "graph_concept_counts"
+
+    graph_id: uuid.UUID = Field(foreign_key="graphs.id", primary_key=True)
+    concept_count: int
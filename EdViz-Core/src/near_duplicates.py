@@ -0,0 +1,164 @@
+"""
+Near-duplicate document detection with MinHash and LSH banding.
+
+Each document's extracted text is reduced to a MinHash signature over
+word shingles. Signatures are split into bands whose hashes are stored in
+`graph_lsh_bands`, so finding candidates is an indexed lookup of a few
+(band, bucket) pairs instead of a scan over every stored graph. Candidates
+are then verified by comparing the full signatures.
+"""
+import hashlib
+import re
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlmodel import Session, select
+
+from config import config
+from models import Graph, GraphLshBand, GraphSignature
+
+# Shingle hashes are 56 bits wide so densified signature values still fit a signed BIGINT
+_HASH_BITS = 56
+_MAX_CANDIDATES = 50
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """Hashed word k-shingles of the normalized text"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return set()
+    return {
+        _hash64(" ".join(words[i:i + size]).encode("utf-8")) >> (64 - _HASH_BITS)
+        for i in range(len(words) - size + 1)
+    }
+
+
+@dataclass
+class NearDuplicate:
+    graph_id: uuid.UUID
+    similarity: float
+
+
+class MinHasher:
+    """
+    One-permutation MinHash signatures with LSH banding (bands * rows == num_perm).
+
+    Instead of num_perm independent hash functions, each shingle hash is
+    routed to one of num_perm bins and every bin keeps its minimum, which
+    gives the same Jaccard estimate in a single pass over the shingles.
+    Empty bins are filled from the next non-empty bin (rotation
+    densification) so short documents still compare correctly.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, min_shingles: int = 50):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Signatures of very short texts are dominated by densification and match too easily
+        self.min_shingles = min_shingles
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """MinHash signature of the text, or None if it is too short to compare"""
+        hashes = shingles(text, self.shingle_size)
+        if not hashes or len(hashes) < self.min_shingles:
+            return None
+
+        num_perm = self.num_perm
+        bins: List[Optional[int]] = [None] * num_perm
+        for h in hashes:
+            index, value = h % num_perm, h // num_perm
+            current = bins[index]
+            if current is None or value < current:
+                bins[index] = value
+
+        # Values are below 2**56 / num_perm, so the offset keeps densified bins distinct
+        offset = (1 << _HASH_BITS) // num_perm
+        signature = []
+        for index in range(num_perm):
+            for distance in range(num_perm):
+                value = bins[(index + distance) % num_perm]
+                if value is not None:
+                    signature.append(value + distance * offset)
+                    break
+        return signature
+
+    def band_buckets(self, signature: List[int]) -> List[int]:
+        """One signed 64-bit bucket id per band, suitable for a BIGINT column"""
+        buckets = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = _hash64(",".join(map(str, chunk)).encode("ascii"))
+            buckets.append(digest - (1 << 64) if digest >= (1 << 63) else digest)
+        return buckets
+
+    @staticmethod
+    def similarity(first: List[int], second: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        if not first or len(first) != len(second):
+            return 0.0
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class NearDuplicateIndex:
+    """Persists signatures next to the graphs table and answers near-duplicate lookups"""
+
+    def __init__(self):
+        self.hasher = MinHasher(
+            num_perm=config.get_int("DEDUP_NUM_PERM", 128),
+            bands=config.get_int("DEDUP_BANDS", 16),
+            shingle_size=config.get_int("DEDUP_SHINGLE_SIZE", 5),
+            min_shingles=config.get_int("DEDUP_MIN_SHINGLES", 50),
+        )
+        self.threshold = config.get_float("DEDUP_THRESHOLD", 0.9)
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        return self.hasher.signature(text)
+
+    def find(self, db: Session, signature: List[int], threshold: Optional[float] = None) -> Optional[NearDuplicate]:
+        """Return the most similar stored graph at or above the threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        keys = list(enumerate(self.hasher.band_buckets(signature)))
+        # Graphs sharing the most bands are the likeliest matches, so keep those when capping
+        candidate_ids = db.execute(
+            select(GraphLshBand.graph_id)
+            .where(tuple_(GraphLshBand.band, GraphLshBand.bucket).in_(keys))
+            .group_by(GraphLshBand.graph_id)
+            .order_by(func.count().desc())
+            .limit(_MAX_CANDIDATES)
+        ).scalars().all()
+        if not candidate_ids:
+            return None
+
+        best: Optional[NearDuplicate] = None
+        rows = db.execute(
+            select(GraphSignature).where(GraphSignature.graph_id.in_(candidate_ids))
+        ).scalars().all()
+        for row in rows:
+            similarity = self.hasher.similarity(signature, row.signature)
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = NearDuplicate(graph_id=row.graph_id, similarity=similarity)
+        return best
+
+    def find_graph(
+        self, db: Session, signature: List[int], threshold: Optional[float] = None
+    ) -> Tuple[Optional[NearDuplicate], Optional[Graph]]:
+        """find() plus the matching graph, so callers can run the whole lookup in one worker thread"""
+        duplicate = self.find(db, signature, threshold)
+        if duplicate is None:
+            return None, None
+        return duplicate, db.get(Graph, duplicate.graph_id)
+
+    def add(self, db: Session, graph_id: uuid.UUID, signature: List[int]) -> None:
+        """Stage the signature and band rows for a graph (committed by the caller)"""
+        db.add(GraphSignature(graph_id=graph_id, signature=signature))
+        for band, bucket in enumerate(self.hasher.band_buckets(signature)):
+            db.add(GraphLshBand(band=band, bucket=bucket, graph_id=graph_id))
@@ -1,10 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Dict, Any
-import uuid
 import logging
-from pathlib import Path
-from graph_generator import GraphGenerator
+from admission import admit
+from rendering import graph_view, render_svg_content
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -12,9 +11,6 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# Initialize graph generator
-graph_generator = GraphGenerator()
-
 # Define request models
 class Node(BaseModel):
     id: str
@@ -31,44 +27,43 @@ class GraphData(BaseModel):
     nodes: List[Node]
     links: List[Link]
 
-@router.post("/graphs/generate-svg")
-async def generate_svg(graph_data: GraphData):
+@router.post("/graphs/generate-svg", dependencies=[Depends(admit("render"))])
+async def generate_svg(
+    graph_data: GraphData,
+    detail: str = Query("auto", pattern="^(auto|full|clusters)$"),
+    expand: List[str] = Query([])
+):
     """
     Generate SVG from graph data.
     
     Args:
         graph_data: Graph data containing nodes and links
+        detail: "auto", "full" or "clusters" (large graphs are collapsed into clusters)
+        expand: Cluster ids to show in full
         
     Returns:
-        dict: Contains the generated SVG content
+        dict: Contains the generated SVG content, detail level and clusters
     """
     try:
-        # Generate a unique ID for this graph
-        unique_id = str(uuid.uuid4())
-        
         # Convert Pydantic model to dict for graph generator
         graph_json = {
             "nodes": [node.dict() for node in graph_data.nodes],
             "links": [link.dict() for link in graph_data.links]
         }
         
-        # Generate SVG using the existing graph generator
-        svg_path = graph_generator.generate_svg(graph_json, unique_id)
-        
-        if not svg_path:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to generate SVG file"
-            )
+        view = graph_view(graph_json, detail, expand)
         
-        # Read the generated SVG file
-        with open(svg_path, "r", encoding="utf-8") as f:
-            svg_content = f.read()
+        # Generate SVG through the artifact store (identical graphs reuse the cached render)
+        svg_content = await render_svg_content(view.graph, "generate_svg")
         
         return {
-            "svg_content": svg_content
+            "svg_content": svg_content,
+            "detail": view.detail,
+            "clusters": view.clusters
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating SVG: {str(e)}")
         raise HTTPException(
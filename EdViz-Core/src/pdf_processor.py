@@ -1,10 +1,112 @@
 import pdfplumber
 import re
+from abc import ABC, abstractmethod
 from pathlib import Path
 import logging
+import threading
+from typing import List, Optional, Tuple
+
+from config import config
+from metrics import registry
+
+try:
+    import pypdfium2
+except ImportError:  # pragma: no cover - pypdfium2 normally ships with pdfplumber
+    pypdfium2 = None
 
 logger = logging.getLogger(__name__)
 
+# PDFium is not thread-safe, even across documents, and uploads extract in worker threads
+_PDFIUM_LOCK = threading.Lock()
+
+EXTRACTOR_SELECTED = registry.counter(
+    "edviz_pdf_extractor_selected_total",
+    "PDF extraction backend used per document",
+    ("extractor",),
+)
+EXTRACTOR_FALLBACKS = registry.counter(
+    "edviz_pdf_extractor_fallbacks_total",
+    "Documents re-extracted with the precise backend after low-quality fast output",
+    ("extractor",),
+)
+
+
+class PDFExtractor(ABC):
+    """Abstract base class for PDF text extraction backends"""
+    name = "unknown"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    @abstractmethod
+    def extract_pages(self, pdf_path: Path, max_pages: Optional[int] = None) -> Tuple[List[str], int]:
+        """Return the raw text of (up to max_pages) pages and the total page count"""
+        pass
+
+
+class PdfPlumberExtractor(PDFExtractor):
+    """Layout-aware extraction; precise but slow"""
+    name = "pdfplumber"
+
+    def extract_pages(self, pdf_path: Path, max_pages: Optional[int] = None) -> Tuple[List[str], int]:
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
+            return [page.extract_text() or "" for page in pages], len(pdf.pages)
+
+
+class PdfiumExtractor(PDFExtractor):
+    """Text-layer extraction through PDFium; much faster, no layout analysis"""
+    name = "pdfium"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return pypdfium2 is not None
+
+    def extract_pages(self, pdf_path: Path, max_pages: Optional[int] = None) -> Tuple[List[str], int]:
+        with _PDFIUM_LOCK:
+            pdf = pypdfium2.PdfDocument(str(pdf_path))
+            try:
+                page_count = len(pdf)
+                limit = page_count if max_pages is None else min(max_pages, page_count)
+                texts = []
+                for index in range(limit):
+                    page = pdf[index]
+                    text_page = page.get_textpage()
+                    try:
+                        texts.append(text_page.get_text_range())
+                    finally:
+                        text_page.close()
+                        page.close()
+                return texts, page_count
+            finally:
+                pdf.close()
+
+
+EXTRACTORS = {extractor.name: extractor for extractor in (PdfiumExtractor, PdfPlumberExtractor)}
+
+
+def text_quality(pages: List[str]) -> float:
+    """
+    Heuristic 0..1 score of how usable extracted text is.
+    Penalizes empty pages, unmapped glyphs ((cid:NN), U+FFFD) and
+    text that is mostly symbols instead of words.
+    """
+    if not pages:
+        return 0.0
+    text = "".join(pages)
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return 0.0
+
+    broken = text.count("�") + 5 * len(re.findall(r"\(cid:\d+\)", text))
+    wordy = sum(1 for c in visible if c.isalnum() or c in ".,;:!?'\"()-")
+    non_empty_pages = sum(1 for page in pages if page.strip())
+
+    score = (wordy - broken) / len(visible)
+    return max(0.0, score) * (non_empty_pages / len(pages))
+
+
 class PDFProcessor:
     def __init__(self):
         self.header_footer_patterns = [
@@ -14,34 +116,82 @@ class PDFProcessor:
             r'Confidential.*',
             r'Draft.*'
         ]
+        # "auto" probes the fast backend first, otherwise a backend name forces it
+        self.extractor_mode = config.get_env_var("PDF_EXTRACTOR", "auto")
+        self.probe_pages = config.get_int("PDF_PROBE_PAGES", 3)
+        self.min_quality = config.get_float("PDF_MIN_TEXT_QUALITY", 0.85)
+        self.min_chars_per_page = config.get_int("PDF_MIN_CHARS_PER_PAGE", 200)
+        self.precise_extractor = PdfPlumberExtractor()
+        self.fast_extractor = PdfiumExtractor() if PdfiumExtractor.is_available() else None
+
+        if self.extractor_mode not in ("auto", *EXTRACTORS):
+            raise ValueError(f"Unknown PDF_EXTRACTOR '{self.extractor_mode}'")
 
     def clean_text(self, text: str) -> str:
         """Clean extracted text by removing headers, footers, and extra whitespace"""
         # Remove headers and footers
         for pattern in self.header_footer_patterns:
             text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.MULTILINE)
-        
+
         # Remove extra whitespace
         text = re.sub(r'\s+', ' ', text)
         text = text.strip()
-        
+
         return text
 
+    def _is_good_text(self, pages: List[str]) -> bool:
+        if not pages:
+            return False
+        chars_per_page = sum(len(page.strip()) for page in pages) / len(pages)
+        return chars_per_page >= self.min_chars_per_page and text_quality(pages) >= self.min_quality
+
+    def select_extractor(self, pdf_path: Path) -> PDFExtractor:
+        """Pick the cheapest backend that gives good text for this document"""
+        if self.extractor_mode != "auto":
+            return EXTRACTORS[self.extractor_mode]()
+        if self.fast_extractor is None:
+            return self.precise_extractor
+
+        try:
+            probe, _ = self.fast_extractor.extract_pages(pdf_path, max_pages=self.probe_pages)
+        except Exception as e:
+            logger.warning("Fast PDF probe failed for %s, using %s: %s", pdf_path, self.precise_extractor.name, e)
+            return self.precise_extractor
+
+        if self._is_good_text(probe):
+            return self.fast_extractor
+        return self.precise_extractor
+
+    def extract_pages(self, pdf_path: Path) -> Tuple[List[str], int, str]:
+        """Extract raw page texts, returning (pages, page count, backend name)"""
+        extractor = self.select_extractor(pdf_path)
+        pages, page_count = extractor.extract_pages(pdf_path)
+
+        # The probe only saw the first pages; fall back if the whole document is poor
+        if extractor is not self.precise_extractor and self.extractor_mode == "auto" and not self._is_good_text(pages):
+            logger.info("Low-quality text from %s for %s, falling back to %s",
+                        extractor.name, pdf_path, self.precise_extractor.name)
+            EXTRACTOR_FALLBACKS.inc(extractor=extractor.name)
+            extractor = self.precise_extractor
+            pages, page_count = extractor.extract_pages(pdf_path)
+
+        EXTRACTOR_SELECTED.inc(extractor=extractor.name)
+        return pages, page_count, extractor.name
+
     def extract_text(self, pdf_path: Path) -> str:
         """Extract and clean text from PDF file"""
+        return self._extract(pdf_path)[0]
+
+    def _extract(self, pdf_path: Path) -> Tuple[str, int, str]:
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                
-                # Clean the extracted text
-                cleaned_text = self.clean_text(text)
-                logger.info(f"Successfully extracted text from {pdf_path}")
-                return cleaned_text
-                
+            pages, page_count, extractor_name = self.extract_pages(pdf_path)
+            text = "".join(page_text + "\n" for page_text in pages if page_text)
+
+            # Clean the extracted text
+            cleaned_text = self.clean_text(text)
+            logger.info("Successfully extracted text from %s with %s", pdf_path, extractor_name)
+            return cleaned_text, page_count, extractor_name
+
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
@@ -49,12 +199,13 @@ class PDFProcessor:
     def process_pdf(self, pdf_path: Path) -> dict:
         """Process PDF file and return extracted information"""
         try:
-            text = self.extract_text(pdf_path)
+            text, page_count, extractor_name = self._extract(pdf_path)
             return {
                 "text": text,
-                "num_pages": len(pdfplumber.open(pdf_path).pages),
-                "file_name": pdf_path.name
+                "num_pages": page_count,
+                "file_name": pdf_path.name,
+                "extractor": extractor_name
             }
         except Exception as e:
             logger.error(f"Error processing PDF: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,147 @@
+"""
+"Related graphs" lookup based on shared concepts.
+
+Every node name in a graph is normalized into a concept (whitespace
+collapsed, trimmed, lower-cased) and stored in the `graph_concepts`
+inverted index next to a per-graph concept count. Finding related graphs
+is then an indexed join over the source graph's concepts instead of a scan
+of the graph_data JSONB column.
+
+The index is rebuilt from the stored graph_data in SQL, so the same
+normalization is used by incremental updates and the backfill migration
+(migrations/create_graph_concepts.sql).
+"""
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlmodel import Session, text
+
+RELATED_METHODS = ("jaccard", "idf")
+
+# Keep in sync with migrations/create_graph_concepts.sql
+_NODE_CONCEPTS = r"""
+    SELECT DISTINCT lower(btrim(regexp_replace(node->>'name', '\s+', ' ', 'g'))) AS concept
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(g.graph_data->'nodes') = 'array' THEN g.graph_data->'nodes' ELSE '[]'::jsonb END
+    ) AS node
+    WHERE jsonb_typeof(node->'name') = 'string'
+"""
+
+_REFRESH_STATEMENTS = [
+    "DELETE FROM graph_concepts WHERE graph_id = ANY(:ids)",
+    f"""
+    INSERT INTO graph_concepts (concept, graph_id)
+    SELECT concepts.concept, g.id
+    FROM graphs g CROSS JOIN LATERAL ({_NODE_CONCEPTS}) AS concepts
+    WHERE g.id = ANY(:ids) AND concepts.concept <> ''
+    """,
+    """
+    INSERT INTO graph_concept_counts (graph_id, concept_count)
+    SELECT g.id, count(gc.concept)
+    FROM graphs g LEFT JOIN graph_concepts gc ON gc.graph_id = g.id
+    WHERE g.id = ANY(:ids)
+    GROUP BY g.id
+    ON CONFLICT (graph_id) DO UPDATE SET concept_count = EXCLUDED.concept_count
+    """,
+]
+
+_SCORES = {
+    "jaccard": "CAST(m.shared AS float) / (c.concept_count + :source_count - m.shared)",
+    # Shared concepts weighted by inverse document frequency, normalized by both graphs' sizes
+    "idf": "m.weight / sqrt(CAST(c.concept_count AS float) * :source_count)",
+}
+
+_RELATED_QUERY = """
+    WITH source AS (
+        SELECT concept FROM graph_concepts WHERE graph_id = :graph_id
+    ),
+    frequencies AS (
+        SELECT gc.concept, count(*) AS df
+        FROM graph_concepts gc JOIN source USING (concept)
+        GROUP BY gc.concept
+        HAVING count(*) <= :max_df
+    ),
+    matches AS (
+        SELECT gc.graph_id, count(*) AS shared, sum(ln(1 + CAST(:total AS float) / f.df)) AS weight
+        FROM graph_concepts gc JOIN frequencies f USING (concept)
+        WHERE gc.graph_id <> :graph_id
+        GROUP BY gc.graph_id
+    )
+    SELECT m.graph_id, g.title, m.shared, {score} AS score
+    FROM matches m
+    JOIN graph_concept_counts c ON c.graph_id = m.graph_id
+    JOIN graphs g ON g.id = m.graph_id
+    ORDER BY score DESC, m.graph_id
+    LIMIT :limit
+"""
+
+
+@dataclass
+class RelatedGraph:
+    graph_id: uuid.UUID
+    title: str
+    shared_concepts: int
+    score: float
+
+
+def refresh_graph_concepts(db: Session, graph_ids: Iterable[uuid.UUID]) -> None:
+    """
+    Rebuild the concept index rows of the given graphs from their stored
+    graph_data. Runs in the caller's transaction (committed by the caller),
+    so the graphs must already be flushed.
+    """
+    ids = list(graph_ids)
+    if not ids:
+        return
+    for statement in _REFRESH_STATEMENTS:
+        db.execute(
+            text(statement).bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True)))),
+            {"ids": ids},
+        )
+
+
+def find_related_graphs(
+    db: Session,
+    graph_id: uuid.UUID,
+    limit: int = 10,
+    method: str = "jaccard",
+    max_document_frequency: int = 5000,
+) -> Optional[List[RelatedGraph]]:
+    """
+    Top-k graphs sharing the most concepts with `graph_id`, or None if the
+    graph does not exist. Concepts found in more than `max_document_frequency`
+    graphs are too common to discriminate and are skipped to keep the join small.
+    """
+    if method not in RELATED_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {', '.join(RELATED_METHODS)}")
+
+    counts = db.execute(
+        text("""
+            SELECT EXISTS (SELECT 1 FROM graphs WHERE id = :graph_id) AS found,
+                   (SELECT concept_count FROM graph_concept_counts WHERE graph_id = :graph_id) AS source_count,
+                   (SELECT count(*) FROM graph_concept_counts) AS total
+        """),
+        {"graph_id": graph_id},
+    ).one()
+    if not counts.found:
+        return None
+    if not counts.source_count:
+        return []
+
+    rows = db.execute(
+        text(_RELATED_QUERY.format(score=_SCORES[method])),
+        {
+            "graph_id": graph_id,
+            "source_count": counts.source_count,
+            "total": counts.total,
+            "max_df": max_document_frequency,
+            "limit": limit,
+        },
+    ).all()
+    return [
+        RelatedGraph(graph_id=row.graph_id, title=row.title, shared_concepts=row.shared, score=round(row.score, 4))
+        for row in rows
+    ]
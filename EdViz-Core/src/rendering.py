@@ -0,0 +1,38 @@
+"""
+Shared helpers that render graph JSON to SVG through the artifact store.
+Errors are raised as HTTPExceptions so endpoints can let them propagate.
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+
+from graph_clustering import GraphView, build_view
+from metrics import stage_timer
+from services import get_artifact_store, get_graph_generator
+
+
+def graph_view(graph_json: Dict[str, Any], detail: str = "auto", expand: List[str] = ()) -> GraphView:
+    """Level-of-detail view of a graph; large graphs are collapsed into clusters"""
+    try:
+        return build_view(graph_json, detail, expand)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def render_svg_digest(graph_json: Dict[str, Any], endpoint: str) -> str:
+    """Render graph JSON into the artifact store (reusing cached renders) and return the SVG digest"""
+    with stage_timer(endpoint, "render_svg"):
+        digest = await asyncio.to_thread(get_graph_generator().render_to_store, graph_json, get_artifact_store())
+    if not digest:
+        raise HTTPException(status_code=500, detail="Failed to generate SVG")
+    return digest
+
+
+async def render_svg_content(graph_json: Dict[str, Any], endpoint: str) -> str:
+    """Render graph JSON to SVG content"""
+    digest = await render_svg_digest(graph_json, endpoint)
+    svg_bytes = await asyncio.to_thread(get_artifact_store().get_bytes, digest)
+    if svg_bytes is None:
+        raise HTTPException(status_code=500, detail="Failed to generate SVG")
+    return svg_bytes.decode("utf-8")
@@ -0,0 +1,108 @@
+"""
+Shared, lazily created service singletons.
+
+Heavy modules (pdfplumber, the OpenAI SDK, ...) are only imported the first
+time a service is requested, so importing the app stays cheap and a
+misconfigured provider fails the requests that need it instead of the whole
+worker at import time.
+"""
+from functools import lru_cache
+import logging
+import time
+
+from config import config
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SERVICE_INIT_SECONDS = registry.gauge(
+    "edviz_service_init_seconds",
+    "Time spent creating each lazily initialized service",
+    ("service",),
+)
+
+
+def _timed_init(name: str, factory):
+    start = time.perf_counter()
+    service = factory()
+    elapsed = time.perf_counter() - start
+    SERVICE_INIT_SECONDS.set(elapsed, service=name)
+    logger.info("Initialized %s in %.3fs", name, elapsed)
+    return service
+
+
+@lru_cache(maxsize=None)
+def get_pdf_processor():
+    from pdf_processor import PDFProcessor
+    return _timed_init("pdf_processor", PDFProcessor)
+
+
+@lru_cache(maxsize=None)
+def get_ai_processor():
+    from ai_processor import AIProcessor
+    return _timed_init("ai_processor", AIProcessor)
+
+
+@lru_cache(maxsize=None)
+def get_graph_generator():
+    from graph_generator import GraphGenerator
+    return _timed_init("graph_generator", GraphGenerator)
+
+
+@lru_cache(maxsize=None)
+def get_near_duplicate_index():
+    from near_duplicates import NearDuplicateIndex
+    return _timed_init("near_duplicate_index", NearDuplicateIndex)
+
+
+@lru_cache(maxsize=None)
+def get_artifact_store():
+    from artifact_store import ArtifactStore
+    return _timed_init("artifact_store", ArtifactStore)
+
+
+@lru_cache(maxsize=None)
+def get_email_service():
+    from email_service import EmailService
+    return _timed_init("email_service", EmailService)
+
+
+@lru_cache(maxsize=None)
+def get_email_outbox():
+    from email_service import EmailOutbox
+    return _timed_init("email_outbox", lambda: EmailOutbox(get_email_service()))
+
+
+def warm_up() -> None:
+    """
+    Optionally pre-create services and pools so the first request does not
+    pay for them. Failures are logged but never prevent startup.
+    """
+    from sqlmodel import text
+    from database import get_engine
+
+    try:
+        # Open (and return to the pool) a DB connection
+        with get_engine().connect() as connection:
+            connection.execute(text("SELECT 1"))
+        logger.info("Warm-up: database pool ready")
+    except Exception as e:
+        logger.warning("Warm-up: database not reachable: %s", e)
+
+    for name, getter in (("pdf_processor", get_pdf_processor), ("ai_processor", get_ai_processor)):
+        try:
+            getter()
+        except Exception as e:
+            logger.warning("Warm-up: could not initialize %s: %s", name, e)
+
+    if config.get_bool("WARMUP_RENDERER", False):
+        try:
+            # Render a tiny graph once so the Mermaid CLI / headless browser caches are hot
+            sample = {"nodes": [{"id": "warmup", "name": "Warm-up"}], "links": []}
+            svg_path = get_graph_generator().generate_svg(sample, "warmup")
+            if svg_path:
+                svg_path.unlink(missing_ok=True)
+            (config.output_dir / "warmup.mmd").unlink(missing_ok=True)
+            logger.info("Warm-up: renderer ready")
+        except Exception as e:
+            logger.warning("Warm-up: renderer not available: %s", e)